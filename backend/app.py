@@ -17,9 +17,15 @@ from flask_cors import CORS
 from config import Config
 from services.database import db
 from services.fund_cache import fund_cache
+from services.circuit_breaker import akshare_breaker
+from services.upstream import upstream_executor
+from services.fund_prewarm import fund_prewarmer
 from services.polling import polling_service
+from services.read_ids import read_id_cache
+from services.leader import leader_election
 from blueprints.fund import fund_bp
 from blueprints.bi import bi_bp
+from blueprints.admin import admin_bp, cache_snapshot
 
 
 def create_app():
@@ -32,6 +38,7 @@ def create_app():
     # 注册Blueprint
     app.register_blueprint(bi_bp)    # Bili Monitor API
     app.register_blueprint(fund_bp)  # 基金API
+    app.register_blueprint(admin_bp)  # 缓存管理API
     
     # 健康检查接口
     @app.route('/health', methods=['GET'])
@@ -47,7 +54,13 @@ def create_app():
         return jsonify({
             'status': 'healthy' if all_healthy else 'degraded',
             'message': 'JJ Simulator API Running' if all_healthy else 'Some services unavailable',
-            'services': status
+            'services': status,
+            'upstream': {
+                'akshare': akshare_breaker.snapshot(),
+                'executor': upstream_executor.snapshot()
+            },
+            'prewarm': fund_prewarmer.snapshot(),
+            'cache': cache_snapshot()
         }), 200 if all_healthy else 503
     
     return app
@@ -62,11 +75,13 @@ def init_services():
     # 初始化数据库（可选，用于Bili Monitor功能）
     if Config.is_db_configured():
         if db.init():
-            # 数据库初始化成功，启动轮询服务
+            # 加载已读记录（轮询时的已读判断走内存）
+            read_id_cache.load()
+            # 数据库初始化成功，参与主节点选举，成为主节点后启动轮询服务
             print("=" * 60)
             print("Initializing Bili Monitor Polling Service...")
             print("=" * 60)
-            polling_service.start()
+            leader_election.start(on_elected=polling_service.start, on_demoted=polling_service.stop)
         else:
             print("[WARN] Database init failed, Bili Monitor unavailable")
     else:
@@ -74,6 +89,9 @@ def init_services():
     
     # 初始化基金缓存（必须）
     fund_cache.init()
+    
+    # 启动热门基金历史数据预热
+    fund_prewarmer.start()
 
     print("=" * 60)
     print("Service initialization complete")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试数据夹具模块
+用录制的DataFrame替换AKShare接口，基准测试完全离线运行
+
+夹具目录结构（每个AKShare接口一个目录/文件，内容为 {"columns": [...], "data": [[...]]}）：
+    fixtures/fund_name_em.json                    基金列表（缺失时按固定种子生成）
+    fixtures/tool_trade_date_hist_sina.json       交易日历（缺失时按工作日生成）
+    fixtures/fund_open_fund_info_em/<code>.json   开放式基金历史净值
+    fixtures/fund_etf_fund_info_em/<code>.json    ETF历史净值（缺失时复用开放式基金夹具）
+"""
+
+import os
+import json
+import zlib
+import random
+from datetime import date
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# 生成基金列表时使用的固定种子和规模（与线上基金数量同一量级）
+FUND_LIST_SEED = 20250722
+FUND_LIST_SIZE = 20000
+
+# 生成基金名称的词表
+_COMPANIES = ['华宝', '易方达', '华夏', '广发', '南方', '富国', '汇添富', '嘉实', '博时', '招商',
+              '天弘', '工银瑞信', '建信', '景顺长城', '中欧', '鹏华', '国泰', '银华', '华安', '兴全']
+_THEMES = ['沪深300', '中证500', '中证1000', '创业板', '科创50', '上证50', '中证红利', '新能源',
+           '医药卫生', '消费', '半导体', '纳斯达克100', '恒生科技', '价值精选', '成长优选', '稳健收益',
+           '纯债', '短债', '可转债', '货币']
+_PRODUCTS = [
+    ('指数', '指数型-股票'),
+    ('ETF', '指数型-股票'),
+    ('ETF联接', '指数型-股票'),
+    ('混合', '混合型-偏股'),
+    ('灵活配置混合', '混合型-灵活'),
+    ('股票', '股票型'),
+    ('债券', '债券型-长债'),
+    ('债券', '债券型-混合二级'),
+    ('QDII', 'QDII'),
+    ('货币', '货币型-普通货币'),
+    ('养老目标', 'FOF-稳健型'),
+]
+
+
+def _read_frame(path: str) -> Optional[pd.DataFrame]:
+    """读取夹具文件为DataFrame，文件不存在时返回None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return None
+    return pd.DataFrame(payload['data'], columns=payload['columns'])
+
+
+def write_frame(path: str, df: pd.DataFrame):
+    """将DataFrame写入夹具文件（日期等对象按字符串保存）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        'columns': [str(c) for c in df.columns],
+        'data': df.astype(object).where(df.notna(), None).values.tolist()
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, default=str)
+
+
+def generate_fund_list(size: int = FUND_LIST_SIZE, seed: int = FUND_LIST_SEED) -> pd.DataFrame:
+    """按固定种子生成基金列表（与 fund_name_em 的列一致），夹具中的基金代码全部包含在内"""
+    rng = random.Random(seed)
+    rows = []
+    for code in history_codes():
+        rows.append([code, 'BENCH', f'基准夹具基金{code}', '指数型-股票', 'JIZHUNJIAJUJIJIN'])
+    
+    code = 0
+    while len(rows) < size:
+        code += rng.randint(1, 40)
+        company = rng.choice(_COMPANIES)
+        theme = rng.choice(_THEMES)
+        product, fund_type = rng.choice(_PRODUCTS)
+        share = rng.choice(['A', 'C', '']) if product != 'ETF' else ''
+        rows.append([f'{code:06d}', 'X', f'{company}{theme}{product}{share}', fund_type, 'X'])
+    
+    return pd.DataFrame(rows, columns=['基金代码', '拼音缩写', '基金简称', '基金类型', '拼音全称'])
+
+
+def generate_trade_dates(start: str = '2005-01-01') -> pd.DataFrame:
+    """按工作日生成交易日历（覆盖到明年年底）"""
+    end = date(date.today().year + 1, 12, 31)
+    return pd.DataFrame({'trade_date': pd.bdate_range(start, end).date})
+
+
+def history_codes(api: str = 'fund_open_fund_info_em') -> List[str]:
+    """夹具中已录制历史数据的基金代码（排序保证顺序稳定）"""
+    try:
+        names = os.listdir(os.path.join(FIXTURES_DIR, api))
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.splitext(n)[0] for n in names if n.endswith('.json'))
+
+
+class FixtureAkshare:
+    """基于夹具的AKShare替身：按接口和参数返回录制的DataFrame"""
+    
+    def __init__(self):
+        self._history: Dict[str, Dict[str, pd.DataFrame]] = {}
+        for api in ('fund_open_fund_info_em', 'fund_etf_fund_info_em'):
+            self._history[api] = {
+                code: _read_frame(os.path.join(FIXTURES_DIR, api, f'{code}.json'))
+                for code in history_codes(api)
+            }
+        if not self._history['fund_open_fund_info_em']:
+            raise RuntimeError(f'{FIXTURES_DIR} 中没有历史净值夹具，请先运行 bench/record.py --seed')
+        
+        self._fund_list = _read_frame(os.path.join(FIXTURES_DIR, 'fund_name_em.json'))
+        if self._fund_list is None:
+            self._fund_list = generate_fund_list()
+        self._trade_dates = _read_frame(os.path.join(FIXTURES_DIR, 'tool_trade_date_hist_sina.json'))
+        if self._trade_dates is None:
+            self._trade_dates = generate_trade_dates()
+        self.calls: Dict[str, int] = {}
+    
+    def _count(self, api: str):
+        self.calls[api] = self.calls.get(api, 0) + 1
+    
+    def _history_for(self, api: str, code: str) -> pd.DataFrame:
+        """已录制的基金直接返回，其他代码按稳定哈希映射到某个夹具（任意代码都有数据）"""
+        frames = self._history[api] or self._history['fund_open_fund_info_em']
+        df = frames.get(code)
+        if df is None:
+            codes = sorted(frames)
+            df = frames[codes[zlib.crc32(code.encode()) % len(codes)]]
+        return df.copy()
+    
+    def fund_name_em(self) -> pd.DataFrame:
+        self._count('fund_name_em')
+        return self._fund_list.copy()
+    
+    def tool_trade_date_hist_sina(self) -> pd.DataFrame:
+        self._count('tool_trade_date_hist_sina')
+        return self._trade_dates.copy()
+    
+    def fund_open_fund_info_em(self, symbol: str, indicator: str = '单位净值走势', period: str = '成立来') -> pd.DataFrame:
+        self._count('fund_open_fund_info_em')
+        return self._history_for('fund_open_fund_info_em', symbol)
+    
+    def fund_etf_fund_info_em(self, fund: str, start_date: str = '20000101', end_date: str = '20500101') -> pd.DataFrame:
+        self._count('fund_etf_fund_info_em')
+        df = self._history_for('fund_etf_fund_info_em', fund)
+        date_column = '净值日期' if '净值日期' in df.columns else df.columns[0]
+        days = pd.to_datetime(df[date_column]).dt.strftime('%Y%m%d')
+        return df[(days >= start_date) & (days <= end_date)].reset_index(drop=True)
+
+
+def install() -> FixtureAkshare:
+    """用夹具替换akshare模块中被服务调用的接口（需在导入服务模块前调用）"""
+    import akshare as ak
+    
+    fake = FixtureAkshare()
+    for api in ('fund_name_em', 'tool_trade_date_hist_sina', 'fund_open_fund_info_em', 'fund_etf_fund_info_em'):
+        setattr(ak, api, getattr(fake, api))
+    return fake
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试夹具录制脚本
+
+    python bench/record.py --seed              从 _backup/*.json 生成历史净值夹具（离线）
+    python bench/record.py --live 017435 ...   从AKShare录制基金列表、交易日历和指定基金的历史净值（需联网）
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fixtures import FIXTURES_DIR, write_frame
+
+
+BACKUP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '_backup')
+
+# 导出文件中的基金（data1.json 即该基金的日增长率序列）
+EXPORT_FILE = 'export_file_20250722104435.json'
+
+# 只有日增长率的备份序列 -> 夹具基金代码
+GROWTH_FILES = {
+    'data2.json': '900002',
+    'data3.json': '900003',
+    'data4--.json': '900004',
+    'data5--.json': '900005',
+    'data6.json': '900006',
+    'data7.json': '900007',
+}
+
+
+def _history_path(code: str) -> str:
+    return os.path.join(FIXTURES_DIR, 'fund_open_fund_info_em', f'{code}.json')
+
+
+def seed_from_backup():
+    """从备份数据生成开放式基金历史净值夹具（列与 fund_open_fund_info_em 一致）"""
+    with open(os.path.join(BACKUP_DIR, EXPORT_FILE), 'r', encoding='utf-8') as f:
+        rows = json.load(f)['data']
+    export = pd.DataFrame({
+        '净值日期': [r['tdate'] for r in rows],
+        '单位净值': [float(r['nav']) for r in rows],
+        '日增长率': [float(r['rz']) for r in rows]
+    })
+    write_frame(_history_path(rows[0]['code']), export)
+    print(f"✓ {rows[0]['code']}: {len(export)} 条")
+    
+    # 只有日增长率的序列：以导出文件的最后一个净值日期为终点按工作日倒推日期，净值从1.0累乘
+    end_date = export['净值日期'].iloc[-1]
+    for name, code in GROWTH_FILES.items():
+        with open(os.path.join(BACKUP_DIR, name), 'r', encoding='utf-8') as f:
+            growth = np.array(json.load(f), dtype=np.float64)
+        dates = pd.bdate_range(end=end_date, periods=len(growth)).strftime('%Y-%m-%d')
+        df = pd.DataFrame({
+            '净值日期': dates,
+            '单位净值': np.round(np.cumprod(1 + growth / 100), 4),
+            '日增长率': growth
+        })
+        write_frame(_history_path(code), df)
+        print(f"✓ {code}（{name}）: {len(df)} 条")
+
+
+def record_live(codes: list):
+    """从AKShare录制真实数据"""
+    import akshare as ak
+    
+    df = ak.fund_name_em()
+    write_frame(os.path.join(FIXTURES_DIR, 'fund_name_em.json'), df)
+    print(f"✓ fund_name_em: {len(df)} 条")
+    
+    df = ak.tool_trade_date_hist_sina()
+    write_frame(os.path.join(FIXTURES_DIR, 'tool_trade_date_hist_sina.json'), df)
+    print(f"✓ tool_trade_date_hist_sina: {len(df)} 条")
+    
+    for code in codes:
+        try:
+            df = ak.fund_open_fund_info_em(symbol=code)
+            write_frame(_history_path(code), df)
+            print(f"✓ {code}: {len(df)} 条")
+        except Exception as e:
+            print(f"录制基金 {code} 失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='录制基准测试夹具')
+    parser.add_argument('--seed', action='store_true', help='从 _backup/*.json 生成历史净值夹具')
+    parser.add_argument('--live', nargs='*', metavar='CODE', help='从AKShare录制数据（需联网）')
+    args = parser.parse_args()
+    
+    if not args.seed and args.live is None:
+        parser.print_help()
+        return
+    if args.seed:
+        seed_from_backup()
+    if args.live is not None:
+        record_live(args.live)
+
+
+if __name__ == '__main__':
+    main()
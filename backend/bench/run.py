@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金接口离线性能基准
+
+AKShare由 bench/fixtures 中录制的数据替代，通过Flask测试客户端和服务函数直接驱动，
+输出每个场景的 p50/p99 延迟、吞吐量和内存分配
+
+    python bench/run.py                              运行全部场景
+    python bench/run.py -k fund_list -n 500          只运行名称包含 fund_list 的场景
+    python bench/run.py --json after.json --compare before.json
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from typing import Callable, Optional, List, Dict, Any
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 必须在导入服务模块前完成：运行时数据写入临时目录，不连接数据库（不启动轮询）
+_DATA_DIR = tempfile.mkdtemp(prefix='jj-bench-')
+os.environ['DATA_DIR'] = _DATA_DIR
+for _key in ('DB_HOST', 'DB_USER', 'DB_PASSWORD', 'DB_NAME'):
+    os.environ[_key] = ''
+
+from bench import fixtures
+
+fake_akshare = fixtures.install()
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import numpy as np
+    import pandas as pd
+    from app import app
+    from services.fund_cache import fund_cache
+    from services.fund_history import fund_history
+    from services.fund_prewarm import fund_prewarmer
+    from services.response_cache import fund_list_response_cache
+
+
+class Scenario:
+    """基准场景：op 为被测操作，setup 在每次操作前执行且不计入耗时"""
+    
+    def __init__(self, name: str, op: Callable[[int], Any], setup: Optional[Callable[[int], Any]] = None):
+        self.name = name
+        self.op = op
+        self.setup = setup
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def measure(scenario: Scenario, iterations: int, warmup: int, alloc_iterations: int) -> Dict[str, Any]:
+    """执行场景：先计时（不开启tracemalloc），再单独统计内存分配"""
+    for i in range(warmup):
+        if scenario.setup:
+            scenario.setup(i)
+        scenario.op(i)
+    
+    timings = []
+    for i in range(iterations):
+        if scenario.setup:
+            scenario.setup(i)
+        start = time.perf_counter_ns()
+        scenario.op(i)
+        timings.append(time.perf_counter_ns() - start)
+    
+    # 每次操作的峰值额外内存与净增内存
+    peaks, nets = [], []
+    tracemalloc.start()
+    for i in range(alloc_iterations):
+        if scenario.setup:
+            scenario.setup(i)
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        scenario.op(i)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        nets.append(current - before)
+    tracemalloc.stop()
+    
+    timings.sort()
+    total = sum(timings)
+    peaks.sort()
+    nets.sort()
+    return {
+        'name': scenario.name,
+        'iterations': iterations,
+        'p50_ms': round(_percentile(timings, 50) / 1e6, 4),
+        'p99_ms': round(_percentile(timings, 99) / 1e6, 4),
+        'mean_ms': round(total / len(timings) / 1e6, 4),
+        'ops_per_sec': round(len(timings) / (total / 1e9), 1) if total else 0.0,
+        'alloc_peak_kb': round(_percentile(peaks, 50) / 1024, 1),
+        'alloc_net_kb': round(_percentile(nets, 50) / 1024, 1)
+    }
+
+
+def build_scenarios() -> List[Scenario]:
+    """基准场景（名称保持稳定，便于跨版本对比）"""
+    client = app.test_client()
+    codes = fixtures.history_codes()
+    long_code = max(codes, key=lambda c: len(fake_akshare.fund_open_fund_info_em(c)))
+    list_codes = fund_cache.get_fund_list()[0].codes
+    queries = ['', '0', '16', '沪深300', '华宝', 'ETF']
+    
+    def get(url: str) -> Callable[[int], Any]:
+        def op(i: int):
+            response = client.get(url)
+            assert response.status_code == 200, f'{url}: {response.status_code}'
+        return op
+    
+    def drop_series(code: str):
+        """清除进程内和本地存储中的序列，使下一次请求重新抓取"""
+        with fund_history._lock:
+            fund_history._series.pop(code, None)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(fund_history._local_path(code))
+    
+    def warm_series(code: str):
+        if fund_history.get(code) is None:
+            fund_history.fetch(code)
+    
+    for code in codes:
+        warm_series(code)
+    
+    scenarios = []
+    
+    # 服务函数
+    for query in queries:
+        scenarios.append(Scenario(
+            f'service.search_funds[q={query}]',
+            lambda i, q=query: fund_cache.search_funds(q, 20)
+        ))
+    scenarios.append(Scenario(
+        'service.search_funds_faceted[q=,types=指数型]',
+        lambda i: fund_cache.search_funds_faceted('', 20, ['指数型'])
+    ))
+    scenarios.append(Scenario(
+        'service.fund_history.fetch[long]',
+        lambda i: fund_history.fetch(long_code)
+    ))
+    scenarios.append(Scenario(
+        'service.fund_series.to_records[long,full]',
+        lambda i: fund_history.get_stale(long_code).to_records(0, 1 << 30)
+    ))
+    
+    # HTTP接口：基金列表（响应字节缓存命中 / 每次清空缓存）
+    for query in ['', '16', '沪深300']:
+        scenarios.append(Scenario(
+            f'http.fund_list[q={query},cached]',
+            get(f'/api/fund_list?query={query}&limit=20')
+        ))
+    scenarios.append(Scenario(
+        'http.fund_list[q=沪深300,uncached]',
+        get('/api/fund_list?query=沪深300&limit=20'),
+        setup=lambda i: fund_list_response_cache.clear()
+    ))
+    scenarios.append(Scenario(
+        'http.fund_list[type=债券型,uncached]',
+        get('/api/fund_list?type=债券型&limit=20'),
+        setup=lambda i: fund_list_response_cache.clear()
+    ))
+    
+    # HTTP接口：基金历史数据（缓存命中 / 冷启动抓取）
+    scenarios.append(Scenario(
+        'http.fund_data[warm,default_range]',
+        get(f'/api/fund_data?code={long_code}')
+    ))
+    scenarios.append(Scenario(
+        'http.fund_data[warm,full_range]',
+        get(f'/api/fund_data?code={long_code}&start_date=19900101')
+    ))
+    scenarios.append(Scenario(
+        'http.fund_data[cold]',
+        get(f'/api/fund_data?code={long_code}&start_date=19900101'),
+        setup=lambda i: drop_series(long_code)
+    ))
+    scenarios.append(Scenario(
+        'http.fund_data[cold,unrecorded_code]',
+        lambda i: get(f'/api/fund_data?code={list_codes[i % len(list_codes)]}')(i),
+        setup=lambda i: drop_series(list_codes[i % len(list_codes)])
+    ))
+    
+    # HTTP接口：多基金对齐矩阵
+    matrix_codes = ','.join(codes[:5])
+    scenarios.append(Scenario(
+        'http.fund_matrix[5,outer]',
+        get(f'/api/fund_matrix?codes={matrix_codes}&start_date=19900101')
+    ))
+    return scenarios
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]] = None):
+    """输出固定格式的结果表，提供基线时附加 p50/p99/吞吐量 的变化百分比"""
+    header = f"{'scenario':<48} {'p50_ms':>10} {'p99_ms':>10} {'ops/s':>10} {'peak_kb':>9} {'net_kb':>8}"
+    if baseline:
+        header += f" {'Δp50':>8} {'Δp99':>8} {'Δops':>8}"
+    print(header)
+    print('-' * len(header))
+    
+    def delta(new: float, old: Optional[float]) -> str:
+        if not old:
+            return f"{'-':>8}"
+        return f"{(new - old) / old * 100:>+7.1f}%"
+    
+    for r in results:
+        line = (f"{r['name']:<48} {r['p50_ms']:>10.4f} {r['p99_ms']:>10.4f} {r['ops_per_sec']:>10.1f} "
+                f"{r['alloc_peak_kb']:>9.1f} {r['alloc_net_kb']:>8.1f}")
+        if baseline:
+            old = baseline.get(r['name'], {})
+            line += (f" {delta(r['p50_ms'], old.get('p50_ms'))} {delta(r['p99_ms'], old.get('p99_ms'))}"
+                     f" {delta(r['ops_per_sec'], old.get('ops_per_sec'))}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='基金接口离线性能基准')
+    parser.add_argument('-n', '--iterations', type=int, default=200, help='每个场景的计时次数')
+    parser.add_argument('--warmup', type=int, default=20, help='每个场景的预热次数')
+    parser.add_argument('--alloc-iterations', type=int, default=20, help='每个场景统计内存分配的次数')
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的场景')
+    parser.add_argument('--json', dest='json_path', help='将结果写入JSON文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果对比')
+    args = parser.parse_args()
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = {r['name']: r for r in json.load(f)['results']}
+    
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scenarios = [s for s in build_scenarios() if args.filter in s.name]
+        results = []
+        for scenario in scenarios:
+            # 接口中的日志输出不计入结果
+            with contextlib.redirect_stdout(io.StringIO()):
+                results.append(measure(scenario, args.iterations, args.warmup, args.alloc_iterations))
+    finally:
+        fund_prewarmer.stop()
+        shutil.rmtree(_DATA_DIR, ignore_errors=True)
+    
+    meta = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'funds': len(fund_cache.get_fund_list()[0]),
+        'iterations': args.iterations,
+        'warmup': args.warmup
+    }
+    print(' '.join(f'{k}={v}' for k, v in meta.items()))
+    print_table(results, baseline)
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
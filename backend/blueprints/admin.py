@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存管理 API Blueprint
+查看基金缓存状态，按基金失效或强制刷新缓存（需要登录令牌）
+"""
+
+import traceback
+
+from flask import Blueprint, jsonify
+
+from blueprints.bi import require_token
+from blueprints.fund import pending_response
+from services.fund_cache import fund_cache
+from services.fund_history import fund_history, FundDataError, UpstreamUnavailableError
+from services.upstream import upstream_executor, UpstreamPendingError, UpstreamBusyError
+from services.response_cache import fund_list_response_cache
+
+# 创建Blueprint
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+def cache_snapshot() -> dict:
+    """全部基金缓存的状态（管理接口和 /health 共用）"""
+    return {
+        'fund_list': fund_cache.snapshot(),
+        'fund_list_responses': fund_list_response_cache.snapshot(),
+        'fund_history': fund_history.snapshot()
+    }
+
+
+@admin_bp.route('/cache', methods=['GET'])
+@require_token
+def get_cache_stats():
+    """缓存状态：条目数、占用字节、命中/未命中/淘汰、最近刷新时间和耗时、版本号"""
+    return jsonify({
+        'success': True,
+        'data': cache_snapshot()
+    })
+
+
+@admin_bp.route('/cache/fund_list/refresh', methods=['POST'])
+@require_token
+def refresh_fund_list():
+    """立即重新抓取基金列表（版本变化时已渲染的响应随之失效）"""
+    upstream_executor.discard('fund_list')
+    try:
+        success = upstream_executor.run('fund_list', fund_cache.refresh)
+    except UpstreamPendingError:
+        return pending_response('基金列表正在刷新中')
+    except UpstreamBusyError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    if not success:
+        return jsonify({'success': False, 'error': '基金列表刷新失败'}), 502
+    return jsonify({
+        'success': True,
+        'data': fund_cache.snapshot()
+    })
+
+
+@admin_bp.route('/cache/fund_list/responses', methods=['DELETE'])
+@require_token
+def clear_fund_list_responses():
+    """清空已渲染的基金列表响应"""
+    fund_list_response_cache.clear()
+    return jsonify({'success': True, 'message': '已清空基金列表响应缓存'})
+
+
+@admin_bp.route('/cache/fund_history/<code>', methods=['DELETE'])
+@require_token
+def invalidate_fund_history(code: str):
+    """删除单只基金的历史数据缓存（含本地存储），下一次请求重新抓取"""
+    if not fund_history.invalidate(code):
+        return jsonify({'success': False, 'error': f'基金 {code} 没有缓存'}), 404
+    return jsonify({'success': True, 'message': f'已删除基金 {code} 的缓存'})
+
+
+@admin_bp.route('/cache/fund_history/<code>/refresh', methods=['POST'])
+@require_token
+def refresh_fund_history(code: str):
+    """忽略缓存立即重新抓取单只基金的历史数据"""
+    try:
+        series = fund_history.force_fetch(code)
+    except UpstreamPendingError:
+        return pending_response(f'基金 {code} 正在刷新中')
+    except (UpstreamUnavailableError, UpstreamBusyError) as e:
+        return jsonify({'success': False, 'error': f'上游数据源暂时不可用: {e}'}), 503
+    except FundDataError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    except Exception as e:
+        print(f"刷新基金 {code} 缓存失败: {e}")
+        print(traceback.format_exc())
+        return jsonify({'success': False, 'error': f'服务器内部错误: {str(e)}'}), 500
+    
+    if series is None:
+        return jsonify({'success': False, 'error': f'未找到基金 {code} 的数据'}), 404
+    return jsonify({
+        'success': True,
+        'data': {
+            'code': code,
+            'rows': len(series),
+            'last_date': str(series.dates[-1]) if len(series) else None
+        }
+    })
@@ -7,7 +7,6 @@ Bili Monitor API Blueprint
 
 import json
 import traceback
-import requests
 import hashlib
 from datetime import datetime, timedelta
 from functools import wraps
@@ -19,7 +18,11 @@ from flask import Blueprint, request, jsonify
 from config import Config
 from services.database import db
 from services.polling import polling_service
+from services.leader import leader_election
+from services.read_ids import read_id_cache
+from services.settings import settings_cache
 from utils.wbi import get_signed_params
+from utils.rate_limit import bili_get, bili_limiter, RateLimitedError
 
 # 创建Blueprint
 bi_bp = Blueprint('bi', __name__, url_prefix='/api/bi')
@@ -165,8 +168,7 @@ def get_settings():
         return err
     
     try:
-        sql = "SELECT * FROM bi_settings WHERE id = 1"
-        row = db.execute_query(sql, fetch_one=True)
+        row = settings_cache.get()
         
         if not row:
             return jsonify({
@@ -247,8 +249,8 @@ def save_settings():
         )
         db.execute_modify(sql, params)
         
-        # 重启轮询服务
-        polling_service.restart()
+        # 重新加载设置缓存，轮询间隔或开关变化时轮询服务收到通知后重新调度
+        settings_cache.invalidate()
         
         return jsonify({'success': True, 'message': '设置已保存'})
     except Exception as e:
@@ -330,8 +332,7 @@ def search_up():
         if not keyword:
             return jsonify({'success': False, 'error': '关键词不能为空'}), 400
         
-        settings = db.execute_query("SELECT cookie FROM bi_settings WHERE id = 1", fetch_one=True)
-        cookie = settings.get('cookie') if settings else ''
+        cookie = settings_cache.get().get('cookie') or ''
         
         if not cookie:
             return jsonify({'success': False, 'error': '请先配置Cookie'}), 400
@@ -349,13 +350,14 @@ def search_up():
             'Referer': 'https://search.bilibili.com/'
         }
         
-        resp = requests.get(
+        data = bili_get(
+            'search',
             'https://api.bilibili.com/x/web-interface/wbi/search/type',
+            max_wait=3,
             params=signed_params,
             headers=headers,
             timeout=10
         )
-        data = resp.json()
         
         if data.get('code') != 0:
             return jsonify({'success': False, 'error': data.get('message', 'B站API错误')}), 500
@@ -373,6 +375,8 @@ def search_up():
             })
         
         return jsonify({'success': True, 'data': ups})
+    except RateLimitedError as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
     except Exception as e:
         print(f"搜索UP主失败: {e}")
         traceback.print_exc()
@@ -608,6 +612,7 @@ def mark_as_read():
             ON DUPLICATE KEY UPDATE item_id = item_id
         """
         db.execute_modify(sql, (item_id, item_type))
+        read_id_cache.add([item_id])
         
         if item_type == 'dynamic':
             db.execute_modify("UPDATE bi_dynamics SET is_read = 1 WHERE dynamic_id = %s", (item_id,))
@@ -629,9 +634,8 @@ def check_read_status(item_id: str):
         return err
     
     try:
-        sql = "SELECT 1 FROM bi_read_ids WHERE item_id = %s"
-        result = db.execute_query(sql, (item_id,), fetch_one=True)
-        return jsonify({'success': True, 'isRead': result is not None})
+        # 其他 worker 刚标记的已读在本进程同步前不可见，未读结果以数据库为准
+        return jsonify({'success': True, 'isRead': read_id_cache.is_read(item_id, confirm=True)})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -669,6 +673,7 @@ def mark_dynamic_comments_as_read(dynamic_id: str):
                 ON DUPLICATE KEY UPDATE item_id = item_id
             """
             db.execute_modify(sql, tuple(values))
+            read_id_cache.add(comment_ids)
             
             # 批量更新 bi_comments 表的 is_read 字段
             placeholders = ','.join(['%s'] * len(comment_ids))
@@ -706,7 +711,12 @@ def bi_health():
             return jsonify({
                 'success': True,
                 'status': 'healthy',
-                'message': 'Bili Monitor API服务运行正常'
+                'message': 'Bili Monitor API服务运行正常',
+                'read_ids': read_id_cache.snapshot(),
+                'settings': settings_cache.snapshot(),
+                'polling': polling_service.snapshot(),
+                'leader': leader_election.snapshot(),
+                'rate_limits': bili_limiter.snapshot()
             })
         else:
             return jsonify({
@@ -6,20 +6,105 @@
 """
 
 import os
+import json
 import traceback
 from datetime import datetime
 
 import akshare as ak
+import numpy as np
 import pandas as pd
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, request, jsonify, send_from_directory
 
 from config import FRONTEND_DIST_DIR
 from services.fund_cache import fund_cache
+from services.circuit_breaker import akshare_breaker, CircuitOpenError
+from services.fund_prewarm import fund_prewarmer
+from services.fund_history import fund_history, FundDataError, UpstreamUnavailableError, to_epoch_day, align_series
+from services.upstream import upstream_executor, UpstreamPendingError, UpstreamBusyError
+from services.response_cache import fund_list_response_cache, CachedResponse
 
 # 创建Blueprint
 fund_bp = Blueprint('fund', __name__)
 
 
+def pending_response(message: str):
+    """上游任务仍在后台执行，返回202供客户端轮询"""
+    retry_after = 2
+    response = jsonify({
+        'success': False,
+        'pending': True,
+        'error': message,
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 202
+
+
+def _parse_types() -> list:
+    """解析基金类型筛选参数（支持 type=A&type=B 及 type=A,B）"""
+    types = []
+    for value in request.args.getlist('type'):
+        for t in value.split(','):
+            t = t.strip()
+            if t and t not in types:
+                types.append(t)
+    return types
+
+
+# 预渲染的热点查询（空查询及常见代码前缀）和返回数量
+HOT_FUND_LIST_QUERIES = ['', '0', '1', '16', '51']
+HOT_FUND_LIST_LIMITS = [10, 20]
+
+
+def _fund_list_cache_key(query: str, limit: int, types: list) -> tuple:
+    """响应缓存key，包含缓存版本号，基金列表刷新后自动失效"""
+    return (fund_cache.version, query, limit, tuple(types))
+
+
+def _render_fund_list(query: str, limit: int, types: list) -> bytes:
+    """执行搜索并序列化基金列表响应"""
+    fund_list, cache_timestamp = fund_cache.get_fund_list()
+    result = fund_cache.search_funds_faceted(query, limit, types)
+    result_funds = result['funds']
+    
+    payload = {
+        'success': True,
+        'data': {
+            'funds': result_funds,
+            'total_count': len(fund_list) if fund_list else 0,
+            'matched_count': result['matched_count'],
+            'returned_count': len(result_funds),
+            'facets': result['facets'],
+            'cache_time': datetime.fromtimestamp(cache_timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        },
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _bytes_response(entry: CachedResponse) -> Response:
+    """根据客户端是否支持gzip返回缓存的响应字节"""
+    if entry.gzip_body is not None and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(entry.gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(entry.body, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def _prerender_hot_fund_lists():
+    """基金列表刷新后预渲染热点查询的响应"""
+    fund_list_response_cache.clear()
+    for query in HOT_FUND_LIST_QUERIES:
+        for limit in HOT_FUND_LIST_LIMITS:
+            key = _fund_list_cache_key(query, limit, [])
+            fund_list_response_cache.put(key, _render_fund_list(query, limit, []))
+    print(f"✓ 已预渲染 {len(HOT_FUND_LIST_QUERIES) * len(HOT_FUND_LIST_LIMITS)} 个热点基金列表响应")
+
+
+fund_cache.add_refresh_listener(_prerender_hot_fund_lists)
+
+
 @fund_bp.route('/api/fund_list', methods=['GET'])
 def get_fund_list():
     """
@@ -27,10 +112,12 @@ def get_fund_list():
     参数:
         query: 搜索关键词，支持基金代码或基金名称模糊匹配 (可选)
         limit: 返回结果数量限制，默认20，最大100 (可选)
+        type: 基金类型或大类筛选，可重复或逗号分隔，如 股票型、指数型、指数型-股票 (可选)
     """
     try:
         query = request.args.get('query', '').strip()
         limit = min(int(request.args.get('limit', 20)), 100)
+        types = _parse_types()
         
         if not fund_cache.is_available:
             return jsonify({
@@ -38,21 +125,67 @@ def get_fund_list():
                 'error': '基金列表数据正在加载中，请稍后重试'
             }), 503
         
-        fund_list, cache_timestamp = fund_cache.get_fund_list()
-        result_funds = fund_cache.search_funds(query, limit)
+        # 热点查询直接返回已序列化（预压缩）的响应字节
+        key = _fund_list_cache_key(query, limit, types)
+        entry = fund_list_response_cache.get(key)
+        if entry is None:
+            entry = fund_list_response_cache.put(key, _render_fund_list(query, limit, types))
+        return _bytes_response(entry)
         
+    except Exception as e:
+        print(f"基金列表API错误: {e}")
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': f'服务器内部错误: {str(e)}'
+        }), 500
+
+
+@fund_bp.route('/api/fund_list/changes', methods=['GET'])
+def get_fund_list_changes():
+    """
+    基金列表增量同步：返回客户端版本之后的变更
+    参数:
+        since: 客户端本地基金列表的版本号 (可选，不传或版本过旧时返回全量)
+    返回:
+        增量：added/updated 为 [代码, 名称, 类型] 行，removed 为代码列表
+        全量：full=true，rows 为全部 [代码, 名称, 类型] 行
+    """
+    try:
+        if not fund_cache.is_available:
+            return jsonify({
+                'success': False,
+                'error': '基金列表数据正在加载中，请稍后重试'
+            }), 503
+        
+        since = request.args.get('since', type=int)
+        changes = fund_cache.get_changes(since) if since is not None else None
+        
+        if changes is not None:
+            return jsonify({
+                'success': True,
+                'data': {
+                    'full': False,
+                    'since': since,
+                    'fields': ['code', 'name', 'type'],
+                    **changes
+                }
+            })
+        
+        fund_list, _ = fund_cache.get_fund_list()
         return jsonify({
             'success': True,
             'data': {
-                'funds': result_funds,
-                'total_count': len(fund_list) if fund_list else 0,
-                'returned_count': len(result_funds),
-                'cache_time': datetime.fromtimestamp(cache_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-            },
+                'full': True,
+                'since': since,
+                'version': fund_cache.version,
+                'fields': ['code', 'name', 'type'],
+                'rows': fund_list.rows()
+            }
         })
         
     except Exception as e:
-        print(f"基金列表API错误: {e}")
+        print(f"基金列表增量同步API错误: {e}")
         print(traceback.format_exc())
         return jsonify({
             'success': False,
@@ -87,101 +220,175 @@ def get_fund_data():
         
         print(f"正在获取基金 {fund_code} 从 {start_date} 到 {end_date} 的数据...")
         
+        stale = False
         try:
-            fund_data = ak.fund_open_fund_info_em(symbol=fund_code)
-        except Exception as e:
-            print(f"获取开放式基金数据失败: {e}")
-            try:
-                fund_data = ak.fund_etf_fund_info_em(fund=fund_code, start_date=start_date, end_date=end_date)
-            except Exception as e2:
-                print(f"获取ETF基金数据也失败: {e2}")
+            series = fund_history.get_or_fetch(fund_code)
+        except FundDataError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+        except UpstreamPendingError:
+            # 超过截止时间：有过期缓存则先返回，否则告知客户端稍后轮询
+            series = fund_history.get_stale(fund_code)
+            if series is None:
+                return pending_response(f'基金 {fund_code} 的数据正在获取中，请稍后重试')
+            stale = True
+            print(f"上游响应超时，返回基金 {fund_code} 的过期缓存数据")
+        except (UpstreamUnavailableError, UpstreamBusyError) as e:
+            # 上游不可用时使用过期的缓存数据兜底
+            series = fund_history.get_stale(fund_code)
+            if series is None:
                 return jsonify({
                     'success': False,
-                    'error': f'无法获取基金 {fund_code} 的数据，请检查基金代码是否正确'
-                }), 404
+                    'error': f'基金数据源暂不可用，请稍后重试: {e}'
+                }), 503
+            stale = True
+            print(f"上游不可用，返回基金 {fund_code} 的过期缓存数据")
         
-        if fund_data.empty:
+        if series is None:
             return jsonify({
                 'success': False,
-                'error': f'基金 {fund_code} 没有找到数据'
+                'error': f'无法获取基金 {fund_code} 的数据，请检查基金代码是否正确'
             }), 404
         
-        # 查找日期列
-        date_column = None
-        for col in ['净值日期', '日期', 'date']:
-            if col in fund_data.columns:
-                date_column = col
-                break
+        # 只统计确实存在的基金，无效代码不进入预热候选
+        fund_prewarmer.record_access(fund_code)
+        
+        # 二分查找日期区间，只处理返回窗口内的数据
+        result_data = series.to_records(to_epoch_day(start_date), to_epoch_day(end_date))
         
-        if not date_column:
+        if not result_data:
             return jsonify({
                 'success': False,
-                'error': '数据中没有找到日期列'
-            }), 500
+                'error': '在指定日期范围内没有找到数据'
+            }), 404
         
-        # 查找日增长率列
-        growth_column = None
-        for col in ['日增长率', 'daily_growth', '涨跌幅']:
-            if col in fund_data.columns:
-                growth_column = col
-                break
+        print(f"成功获取 {len(result_data)} 条数据")
         
-        if not growth_column:
+        return jsonify({
+            'success': True,
+            'data': {
+                'list': result_data,
+                'fund_code': fund_code,
+                'start_date': start_date,
+                'end_date': end_date,
+                'count': len(result_data),
+                'stale': stale,
+                'data_time': datetime.fromtimestamp(series.fetched_at).strftime('%Y-%m-%d %H:%M:%S')
+            }
+        })
+        
+    except Exception as e:
+        print(f"API错误: {e}")
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': f'服务器内部错误: {str(e)}'
+        }), 500
+
+
+MATRIX_MAX_CODES = 20
+
+
+def _matrix_values(df: pd.DataFrame) -> list:
+    """DataFrame转换为二维列表，缺失值输出为null"""
+    values = df.to_numpy(dtype=np.float64)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+@fund_bp.route('/api/fund_matrix', methods=['GET'])
+def get_fund_matrix():
+    """
+    获取多只基金按交易日对齐的数据矩阵（日期 × 基金），并返回日增长率的相关系数矩阵和协方差矩阵
+    参数:
+        codes: 基金代码，逗号分隔，最多20只 (必需)
+        start_date: 开始日期，格式YYYYMMDD (可选，默认20230101)
+        end_date: 结束日期，格式YYYYMMDD (可选，默认为今天)
+        field: growth 日增长率（默认）或 net_value 单位净值 (可选)
+        join: outer 所有日期的并集（默认）或 inner 共同交易日 (可选)
+        fill: none 保留空值（默认）、ffill 向前填充或 zero 填充为0 (可选)
+    """
+    try:
+        codes = []
+        for code in request.args.get('codes', '').split(','):
+            code = code.strip()
+            if code and code not in codes:
+                codes.append(code)
+        start_date = request.args.get('start_date') or '20230101'
+        end_date = request.args.get('end_date') or datetime.now().strftime('%Y%m%d')
+        field = request.args.get('field', 'growth')
+        join = request.args.get('join', 'outer')
+        fill = request.args.get('fill', 'none')
+        
+        if not codes:
             return jsonify({
                 'success': False,
-                'error': '数据中没有找到日增长率列'
-            }), 500
+                'error': '基金代码不能为空'
+            }), 400
         
-        # 净值列
-        net_value_column = None
-        for col in ['单位净值', 'net_value', '收盘']:
-            if col in fund_data.columns:
-                net_value_column = col
-                break
+        if len(codes) > MATRIX_MAX_CODES:
+            return jsonify({
+                'success': False,
+                'error': f'最多同时对比 {MATRIX_MAX_CODES} 只基金'
+            }), 400
         
-        # 转换日期格式并筛选日期范围
-        fund_data[date_column] = pd.to_datetime(fund_data[date_column])
-        start_dt = pd.to_datetime(start_date, format='%Y%m%d')
-        end_dt = pd.to_datetime(end_date, format='%Y%m%d')
+        if field not in ('growth', 'net_value') or join not in ('outer', 'inner') or fill not in ('none', 'ffill', 'zero'):
+            return jsonify({
+                'success': False,
+                'error': '参数错误: field 可选 growth/net_value，join 可选 outer/inner，fill 可选 none/ffill/zero'
+            }), 400
         
-        mask = (fund_data[date_column] >= start_dt) & (fund_data[date_column] <= end_dt)
-        filtered_data = fund_data[mask].copy()
+        fetched = fund_history.get_many(codes)
+        if fetched['pending']:
+            return pending_response(f"基金 {','.join(fetched['pending'])} 的数据正在获取中，请稍后重试")
         
-        if filtered_data.empty:
+        series_map = {code: fetched['series'][code] for code in codes if code in fetched['series']}
+        for code in series_map:
+            fund_prewarmer.record_access(code)
+        if not series_map:
             return jsonify({
                 'success': False,
-                'error': '在指定日期范围内没有找到数据'
+                'error': '无法获取任何基金的数据，请检查基金代码是否正确'
             }), 404
         
-        filtered_data = filtered_data.sort_values(date_column)
+        start_day, end_day = to_epoch_day(start_date), to_epoch_day(end_date)
+        matrix = align_series(series_map, start_day, end_day, field=field, join=join, fill=fill)
+        if matrix.empty:
+            return jsonify({
+                'success': False,
+                'error': '在指定日期范围内没有找到数据'
+            }), 404
         
-        result_data = []
-        for _, row in filtered_data.iterrows():
-            item = {
-                'date': row[date_column].strftime('%Y-%m-%d'),
-                'daily_growth': float(row[growth_column]) if pd.notna(row[growth_column]) else 0.0
-            }
-            
-            if net_value_column and pd.notna(row[net_value_column]):
-                item['net_value'] = float(row[net_value_column])
-            
-            result_data.append(item)
+        # 相关系数/协方差基于未填充的日增长率计算（成对剔除缺失值）
+        if field == 'growth' and fill == 'none':
+            growth = matrix
+        else:
+            growth = align_series(series_map, start_day, end_day, field='growth', join=join)
+        corr = growth.corr(min_periods=2)
+        cov = growth.cov(min_periods=2)
         
-        print(f"成功获取 {len(result_data)} 条数据")
+        dates = np.datetime_as_string(matrix.index.to_numpy().astype('datetime64[D]'), unit='D').tolist()
         
         return jsonify({
             'success': True,
             'data': {
-                'list': result_data,
-                'fund_code': fund_code,
+                'codes': list(matrix.columns),
+                'dates': dates,
+                'field': field,
+                'values': _matrix_values(matrix),
+                'correlation': _matrix_values(corr),
+                'covariance': _matrix_values(cov),
+                'missing': fetched['missing'],
+                'stale': fetched['stale'],
                 'start_date': start_date,
                 'end_date': end_date,
-                'count': len(result_data)
+                'count': len(dates)
             }
         })
         
     except Exception as e:
-        print(f"API错误: {e}")
+        print(f"基金矩阵API错误: {e}")
         print(traceback.format_exc())
         return jsonify({
             'success': False,
@@ -202,7 +409,26 @@ def get_fund_info():
             }), 400
         
         try:
-            fund_names = ak.fund_name_em()
+            try:
+                fund_names = upstream_executor.run('fund_name_em', akshare_breaker.call, ak.fund_name_em)
+            except (CircuitOpenError, OSError, UpstreamPendingError, UpstreamBusyError) as e:
+                # 上游不可用或超时时从基金列表缓存兜底
+                fund = fund_cache.get_fund(fund_code)
+                if fund is None:
+                    if isinstance(e, UpstreamPendingError):
+                        return pending_response('基金信息正在获取中，请稍后重试')
+                    raise
+                print(f"上游不可用，使用缓存的基金信息: {e}")
+                return jsonify({
+                    'success': True,
+                    'data': {
+                        'code': fund_code,
+                        'name': fund['name'],
+                        'type': fund['type'],
+                        'stale': True
+                    }
+                })
+            
             fund_info = fund_names[fund_names['基金代码'] == fund_code]
             
             if fund_info.empty:
@@ -40,6 +40,50 @@ class Config:
     DB_POOL_MIN_CACHED = int(os.environ.get('DB_POOL_MIN_CACHED', 2))
     DB_POOL_MAX_CACHED = int(os.environ.get('DB_POOL_MAX_CACHED', 10))  # 增加到10
     
+    # 基金历史数据缓存配置
+    FUND_HISTORY_TTL = int(os.environ.get('FUND_HISTORY_TTL', 1800))  # 进程内历史数据有效期(秒)
+    FUND_HISTORY_MAX_CODES = int(os.environ.get('FUND_HISTORY_MAX_CODES', 500))  # 进程内最多缓存的基金历史序列数，超出时淘汰最久未用的
+    FUND_NAV_PUBLISH_TIME = os.environ.get('FUND_NAV_PUBLISH_TIME', '22:00')  # 交易日净值发布完成时间
+    FUND_PREWARM_TOP_N = int(os.environ.get('FUND_PREWARM_TOP_N', 50))  # 预热访问量最高的基金数量
+    FUND_PREWARM_INTERVAL = float(os.environ.get('FUND_PREWARM_INTERVAL', 2))  # 预热抓取间隔(秒)
+    FUND_WATCH_DAYS = int(os.environ.get('FUND_WATCH_DAYS', 7))  # 最近N天内请求过的基金在净值发布后增量刷新
+    FUND_ACCESS_FLUSH_INTERVAL = float(os.environ.get('FUND_ACCESS_FLUSH_INTERVAL', 30))  # 各进程访问计数合并到共享文件的间隔(秒)
+    FUND_ACCESS_MAX_CODES = int(os.environ.get('FUND_ACCESS_MAX_CODES', 5000))  # 访问统计最多保留的基金数量
+    
+    # 基金列表热点查询响应缓存条目数
+    FUND_LIST_CACHE_SIZE = int(os.environ.get('FUND_LIST_CACHE_SIZE', 256))
+    # 保留的基金列表版本差异数量（客户端增量同步的最大跨度）
+    FUND_LIST_MAX_DIFFS = int(os.environ.get('FUND_LIST_MAX_DIFFS', 30))
+    
+    # AKShare上游熔断配置
+    AKSHARE_BREAKER_FAILURE_RATE = float(os.environ.get('AKSHARE_BREAKER_FAILURE_RATE', 0.5))  # 失败率阈值
+    AKSHARE_BREAKER_WINDOW = int(os.environ.get('AKSHARE_BREAKER_WINDOW', 20))  # 统计窗口(调用次数)
+    AKSHARE_BREAKER_MIN_CALLS = int(os.environ.get('AKSHARE_BREAKER_MIN_CALLS', 5))  # 最少调用次数
+    AKSHARE_BREAKER_SLOW_CALL = float(os.environ.get('AKSHARE_BREAKER_SLOW_CALL', 15))  # 慢调用阈值(秒)
+    AKSHARE_BREAKER_OPEN_SECONDS = float(os.environ.get('AKSHARE_BREAKER_OPEN_SECONDS', 60))  # 熔断冷却时间(秒)
+    
+    # 上游执行器配置
+    UPSTREAM_WORKERS = int(os.environ.get('UPSTREAM_WORKERS', 4))  # 上游抓取线程数
+    UPSTREAM_MAX_PENDING = int(os.environ.get('UPSTREAM_MAX_PENDING', 32))  # 最多排队+执行中的任务数
+    UPSTREAM_DEADLINE = float(os.environ.get('UPSTREAM_DEADLINE', 8))  # 请求等待上游的截止时间(秒)
+    UPSTREAM_RESULT_TTL = float(os.environ.get('UPSTREAM_RESULT_TTL', 60))  # 后台完成结果保留时间(秒)
+    
+    # Bili Monitor 轮询配置
+    BI_POLL_CONCURRENCY = int(os.environ.get('BI_POLL_CONCURRENCY', 8))  # 同时轮询的UP主数量上限（不应超过 DB_POOL_SIZE）
+    BI_SUB_REPLY_CONCURRENCY = int(os.environ.get('BI_SUB_REPLY_CONCURRENCY', 4))  # 同时抓取子回复页的请求数上限（所有轮询任务共享）
+    BI_POLL_BUDGET = int(os.environ.get('BI_POLL_BUDGET', 120))  # 轮询每分钟最多发出的B站请求数（翻页和子回复请求都计入）
+    BI_FEED_MAX_PAGES = int(os.environ.get('BI_FEED_MAX_PAGES', 5))  # 单个UP主每轮最多翻页数（追赶高水位之后的动态）
+    BI_RATE_SCALE = float(os.environ.get('BI_RATE_SCALE', 1.0))  # B站各接口限流速率的倍数
+    BI_RATE_MAX_WAIT = float(os.environ.get('BI_RATE_MAX_WAIT', 10))  # 等待令牌或风控冷却的最长时间(秒)，超过则放弃本次请求
+    BI_LEADER_LEASE = int(os.environ.get('BI_LEADER_LEASE', 30))  # 轮询主节点租约时长(秒)，主节点失联后最多这么久由其他进程接管
+    BI_LEADER_HEARTBEAT = float(os.environ.get('BI_LEADER_HEARTBEAT', 10))  # 租约续期间隔(秒)，应明显小于租约时长
+    BI_READ_ID_CACHE_SIZE = int(os.environ.get('BI_READ_ID_CACHE_SIZE', 200000))  # 内存中保存的已读ID数量上限
+    BI_READ_ID_SYNC_INTERVAL = float(os.environ.get('BI_READ_ID_SYNC_INTERVAL', 60))  # 已读ID增量同步间隔(秒)
+    BI_SETTINGS_TTL = float(os.environ.get('BI_SETTINGS_TTL', 30))  # 设置缓存有效期(秒)，其他进程保存的设置在此时间内生效
+    
+    # 本地数据目录（持久化运行时学习到的状态）
+    DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    
     @classmethod
     def get_db_config(cls) -> dict:
         """获取数据库配置字典"""
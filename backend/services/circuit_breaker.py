@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断器模块
+统计上游调用的失败率和耗时，上游故障时快速失败并定期半开探测
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Tuple, Type
+
+from config import Config
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """滑动窗口熔断器
+
+    - closed: 正常放行，窗口内失败率（慢调用计为失败）超过阈值时打开
+    - open: 直接拒绝调用，冷却时间结束后进入半开
+    - half_open: 只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 5, slow_call_seconds: float = 15.0, open_seconds: float = 60.0,
+                 failure_exceptions: Tuple[Type[BaseException], ...] = (OSError,)):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        # 只有网络类异常才算上游故障；数据不存在等业务异常不影响熔断统计
+        self.failure_exceptions = failure_exceptions
+
+        self._lock = threading.Lock()
+        self._window: deque = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats: Dict[str, Any] = {
+            'calls': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'rejected': 0,
+            'last_failure': None,
+            'last_failure_time': None,
+            'last_state_change': time.time()
+        }
+        # gunicorn preload 时子进程复制了父进程的锁和进行中的探测状态，探测在子进程中不会完成
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """当前状态（冷却结束的打开状态视为半开）"""
+        with self._lock:
+            if self._state == self.OPEN and time.time() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于拒绝调用的状态"""
+        return self.state == self.OPEN
+
+    def _set_state(self, state: str):
+        """切换状态（调用方持有锁）"""
+        if self._state == state:
+            return
+        self._state = state
+        self._stats['last_state_change'] = time.time()
+        if state == self.OPEN:
+            self._opened_at = time.time()
+        print(f"熔断器 {self.name} 状态切换为 {state}")
+
+    def _acquire(self) -> bool:
+        """判断本次调用是否放行"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.time() - self._opened_at < self.open_seconds:
+                    self._stats['rejected'] += 1
+                    return False
+                self._set_state(self.HALF_OPEN)
+                self._probe_in_flight = False
+
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self._stats['rejected'] += 1
+                    return False
+                self._probe_in_flight = True
+
+            return True
+
+    def _record(self, ok: bool, elapsed: float, error: Optional[BaseException] = None):
+        """记录调用结果"""
+        with self._lock:
+            self._stats['calls'] += 1
+            if elapsed >= self.slow_call_seconds:
+                self._stats['slow_calls'] += 1
+                ok = False
+            if not ok:
+                self._stats['failures'] += 1
+                self._stats['last_failure'] = str(error) if error else f'慢调用 {elapsed:.1f}s'
+                self._stats['last_failure_time'] = time.time()
+
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                self._window.clear()
+                self._set_state(self.CLOSED if ok else self.OPEN)
+                return
+
+            self._window.append(ok)
+            if len(self._window) >= self.min_calls:
+                failed = sum(1 for x in self._window if not x)
+                if failed / len(self._window) >= self.failure_rate:
+                    self._window.clear()
+                    self._set_state(self.OPEN)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """通过熔断器调用上游函数
+
+        Raises:
+            CircuitOpenError: 熔断器打开，调用被拒绝
+        """
+        if not self._acquire():
+            raise CircuitOpenError(f'上游服务 {self.name} 暂不可用（熔断中）')
+
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_exceptions as e:
+            self._record(False, time.monotonic() - start, e)
+            raise
+        except BaseException:
+            self._record(True, time.monotonic() - start)
+            raise
+
+        self._record(True, time.monotonic() - start)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照（用于健康检查）"""
+        state = self.state
+        with self._lock:
+            window = list(self._window)
+            stats = dict(self._stats)
+            opened_at = self._opened_at
+
+        failed = sum(1 for x in window if not x)
+        result = {
+            'state': state,
+            'window_calls': len(window),
+            'window_failure_rate': round(failed / len(window), 3) if window else 0.0,
+            **stats
+        }
+        if state == self.OPEN:
+            result['retry_in'] = round(max(0.0, self.open_seconds - (time.time() - opened_at)), 1)
+        return result
+
+
+# AKShare（东方财富）上游熔断器
+akshare_breaker = CircuitBreaker(
+    'akshare',
+    failure_rate=Config.AKSHARE_BREAKER_FAILURE_RATE,
+    window=Config.AKSHARE_BREAKER_WINDOW,
+    min_calls=Config.AKSHARE_BREAKER_MIN_CALLS,
+    slow_call_seconds=Config.AKSHARE_BREAKER_SLOW_CALL,
+    open_seconds=Config.AKSHARE_BREAKER_OPEN_SECONDS
+)
@@ -5,7 +5,7 @@
 管理数据库连接池和基本操作
 """
 
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 import time
 import pymysql
 from pymysql.cursors import DictCursor
@@ -194,6 +194,36 @@ class DatabaseService:
                 except Exception as e:
                     print(f"关闭数据库连接时出错: {e}")
     
+    def execute_many(self, sql: str, params_list: Sequence[Sequence]) -> int:
+        """批量执行修改SQL（单个事务），返回受影响行数
+        
+        INSERT ... VALUES 语句由pymysql合并为多行插入，一次往返完成
+        """
+        if not params_list:
+            return 0
+        conn = None
+        try:
+            conn = self.get_connection()
+            with conn.cursor() as cursor:
+                result = cursor.executemany(sql, params_list)
+                conn.commit()
+                return result
+        except Exception as e:
+            print(f"数据库批量修改错误: {e}")
+            print(f"SQL: {sql[:200]}...")
+            if conn:
+                try:
+                    conn.rollback()
+                except:
+                    pass
+            raise
+        finally:
+            if conn:
+                try:
+                    conn.close()
+                except Exception as e:
+                    print(f"关闭数据库连接时出错: {e}")
+    
     def health_check(self) -> bool:
         """健康检查"""
         if not self.is_available:
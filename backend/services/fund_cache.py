@@ -5,15 +5,223 @@
 管理基金列表的缓存和定时更新
 """
 
+import os
+import sys
+import json
 import time
+import heapq
 import threading
 import traceback
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Sequence, Iterable, Tuple, FrozenSet
 
 import akshare as ak
 import pandas as pd
 
+from config import Config
+from services.circuit_breaker import akshare_breaker
+from utils.file_lock import file_lock
+
+
+class FundTable:
+    """基金列表的紧凑列式存储
+    
+    基金代码/名称/类型保存为平行元组（类型字符串驻留共享），搜索只在数组上扫描，
+    仅为最终返回的结果构造dict
+    """
+    
+    __slots__ = ('codes', 'names', 'types', '_codes_lower', '_names_lower', '_sorted_codes', '_sorted_pos',
+                 '_postings', '_type_members', '_facets', '_nbytes')
+    
+    def __init__(self, codes: Sequence[str], names: Sequence[str], types: Sequence[str]):
+        self.codes = tuple(codes)
+        self.names = tuple(names)
+        self.types = tuple(sys.intern(t) for t in types)
+        # 小写名称与原名称相同时复用同一对象，不额外占用内存
+        self._codes_lower = tuple(_lower_or_self(c) for c in self.codes)
+        self._names_lower = tuple(_lower_or_self(n) for n in self.names)
+        # 按代码排序的下标，用于二分查找单只基金
+        order = sorted(range(len(self.codes)), key=self.codes.__getitem__)
+        self._sorted_codes = tuple(self.codes[i] for i in order)
+        self._sorted_pos = array('I', order)
+        self._nbytes: Optional[int] = None
+        self._build_postings()
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'FundTable':
+        """从AKShare返回的基金列表构建"""
+        codes = df['基金代码'].astype(str).str.strip()
+        names = df['基金简称'].astype(str).str.strip()
+        if '基金类型' in df.columns:
+            types = df['基金类型'].where(df['基金类型'].notna(), '').astype(str).str.strip()
+        else:
+            types = pd.Series([''] * len(df), index=df.index)
+        
+        valid = (codes != '') & (names != '') & df['基金代码'].notna() & df['基金简称'].notna()
+        return cls(codes[valid].tolist(), names[valid].tolist(), types[valid].tolist())
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    @property
+    def nbytes(self) -> int:
+        """占用内存的估算值（首次访问时计算，共享的字符串对象只计一次）"""
+        if self._nbytes is None:
+            seen = set()
+            total = self._sorted_pos.itemsize * len(self._sorted_pos)
+            for column in (self.codes, self.names, self.types, self._codes_lower, self._names_lower,
+                           self._sorted_codes):
+                total += sys.getsizeof(column)
+                for value in column:
+                    if id(value) not in seen:
+                        seen.add(id(value))
+                        total += sys.getsizeof(value)
+            self._nbytes = total
+        return self._nbytes
+    
+    def rows(self) -> List[Tuple[str, str, str]]:
+        """全部基金的 (代码, 名称, 类型) 行"""
+        return list(zip(self.codes, self.names, self.types))
+    
+    def record(self, i: int) -> Dict:
+        """构造接口返回的基金信息dict（净值字段为兼容前端保留的占位值）"""
+        return {
+            'code': self.codes[i],
+            'name': self.names[i],
+            'type': self.types[i],
+            'net_value': 0,
+            'daily_growth': 0,
+            'total_value': 0
+        }
+    
+    def find(self, code: str) -> Optional[int]:
+        """按基金代码二分查找，返回下标"""
+        pos = bisect_left(self._sorted_codes, code)
+        if pos < len(self._sorted_codes) and self._sorted_codes[pos] == code:
+            return self._sorted_pos[pos]
+        return None
+    
+    def expand_types(self, types: Iterable[str]) -> FrozenSet[str]:
+        """将筛选值展开为完整基金类型集合（大类如“指数型”匹配其下所有子类型）"""
+        expanded = set()
+        for t in types:
+            expanded.update(self._type_members.get(t, ()))
+        return frozenset(expanded)
+    
+    def search(self, query: str, limit: int, types: Iterable[str] = None) -> Tuple[List[int], int, Dict]:
+        """搜索基金代码或名称包含关键词的基金
+        
+        Args:
+            query: 关键词，为空时不做文本匹配
+            limit: 返回数量
+            types: 基金类型或大类筛选（多个值取并集）
+        
+        Returns:
+            (按匹配度排序的前 limit 个下标, 匹配总数, 关键词命中结果的类型分面计数)
+        """
+        allowed = self.expand_types(types) if types else None
+        
+        if not query:
+            facets = self._facets
+            if allowed is None:
+                return list(range(min(limit, len(self.codes)))), len(self.codes), facets
+            # 无关键词时直接取分类倒排表，无需扫描
+            postings = [self._postings[t] for t in allowed]
+            matched_count = sum(len(p) for p in postings)
+            return list(islice(heapq.merge(*postings), limit)), matched_count, facets
+        
+        query_lower = query.lower()
+        codes, codes_lower, names_lower = self.codes, self._codes_lower, self._names_lower
+        matched = [
+            i for i, (code, name) in enumerate(zip(codes_lower, names_lower))
+            if query_lower in code or query_lower in name
+        ]
+        facets = self._count_facets(matched)
+        if allowed is not None:
+            fund_types = self.types
+            matched = [i for i in matched if fund_types[i] in allowed]
+        
+        # 按匹配度排序：代码完全匹配 > 代码前缀 > 名称前缀 > 其他
+        def sort_key(i):
+            code_lower = codes_lower[i]
+            if code_lower == query_lower:
+                return (0, codes[i])
+            elif code_lower.startswith(query_lower):
+                return (1, codes[i])
+            elif names_lower[i].startswith(query_lower):
+                return (2, self.names[i])
+            else:
+                return (3, self.names[i])
+        
+        return heapq.nsmallest(limit, matched, key=sort_key), len(matched), facets
+    
+    def _build_postings(self):
+        """构建 基金类型 -> 下标 的倒排表及大类（“-”之前的部分）映射"""
+        buckets: Dict[str, List[int]] = {}
+        for i, t in enumerate(self.types):
+            buckets.setdefault(t, []).append(i)
+        self._postings = {t: array('I', idx) for t, idx in buckets.items()}
+        
+        members: Dict[str, set] = {}
+        for t in self._postings:
+            members.setdefault(t, set()).add(t)
+            category = _type_category(t)
+            if category != t:
+                members.setdefault(category, set()).add(t)
+        self._type_members = {k: frozenset(v) for k, v in members.items()}
+        self._facets = self._facets_from_counts({t: len(p) for t, p in self._postings.items()})
+    
+    def _count_facets(self, indices: List[int]) -> Dict:
+        """统计一组下标的类型分面"""
+        fund_types = self.types
+        return self._facets_from_counts(Counter(fund_types[i] for i in indices))
+    
+    @staticmethod
+    def _facets_from_counts(type_counts: Dict[str, int]) -> Dict:
+        """由完整类型计数汇总出大类计数"""
+        categories: Counter = Counter()
+        for t, count in type_counts.items():
+            categories[_type_category(t)] += count
+        return {
+            'types': dict(sorted(type_counts.items(), key=lambda x: -x[1])),
+            'categories': dict(categories.most_common())
+        }
+
+
+def _type_category(fund_type: str) -> str:
+    """基金大类，如“指数型-股票”的大类为“指数型”"""
+    return fund_type.split('-', 1)[0]
+
+
+def _lower_or_self(text: str) -> str:
+    """返回小写字符串，内容不变时返回原对象"""
+    lowered = text.lower()
+    return text if lowered == text else lowered
+
+
+# 基金列表版本快照及版本间差异的持久化文件
+VERSION_STATE_FILE = 'fund_list_versions.json'
+
+
+def _diff_rows(old_rows: List[Tuple[str, str, str]], new_rows: List[Tuple[str, str, str]]) -> Dict[str, list]:
+    """计算两个基金列表快照之间的差异（新增/删除/名称或类型变更）"""
+    old_map = {code: (name, fund_type) for code, name, fund_type in old_rows}
+    new_map = {code: (name, fund_type) for code, name, fund_type in new_rows}
+    
+    added, updated = [], []
+    for code, value in new_map.items():
+        old_value = old_map.get(code)
+        if old_value is None:
+            added.append([code, *value])
+        elif old_value != value:
+            updated.append([code, *value])
+    removed = [code for code in old_map if code not in new_map]
+    return {'added': added, 'removed': removed, 'updated': updated}
+
 
 class FundCacheService:
     """基金缓存服务类"""
@@ -31,11 +239,28 @@ class FundCacheService:
         
         self._cache: Dict[str, Any] = {
             'data': None,
-            'timestamp': 0
+            'timestamp': 0,
+            'version': 0
         }
+        # 版本历史：最近若干次快照之间的差异，供客户端增量同步
+        self._diffs: List[Dict[str, Any]] = []
+        self._version_path = os.path.join(Config.DATA_DIR, VERSION_STATE_FILE)
         self._lock = threading.Lock()
         self._initialized = False
         self._timer: Optional[threading.Timer] = None
+        self._refresh_listeners: List[Callable[[], None]] = []
+        # 查询命中/未命中统计（缓存不可用或基金不存在计为未命中）
+        self._stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0
+        }
+        # 最近一次刷新的情况
+        self._last_refresh: Dict[str, Any] = {
+            'started_at': None,
+            'duration': None,
+            'success': None
+        }
+        self._refresh_count = 0
     
     def init(self) -> bool:
         """初始化基金缓存服务"""
@@ -61,10 +286,23 @@ class FundCacheService:
         return success
     
     def _fetch_fund_list(self) -> bool:
+        """抓取基金列表数据并更新缓存，记录耗时和结果"""
+        started = time.time()
+        success = self._do_fetch_fund_list()
+        with self._lock:
+            self._refresh_count += 1
+            self._last_refresh = {
+                'started_at': started,
+                'duration': round(time.time() - started, 3),
+                'success': success
+            }
+        return success
+    
+    def _do_fetch_fund_list(self) -> bool:
         """抓取基金列表数据并更新缓存"""
         try:
             print("正在获取基金列表数据...")
-            fund_df = ak.fund_name_em()
+            fund_df = akshare_breaker.call(ak.fund_name_em)
             
             if fund_df.empty:
                 print("警告: 获取到的基金列表数据为空")
@@ -72,29 +310,17 @@ class FundCacheService:
             
             print(f"从AKShare获取到 {len(fund_df)} 条原始数据，正在处理...")
             
-            fund_list = []
-            for _, row in fund_df.iterrows():
-                try:
-                    fund_info = {
-                        'code': str(row.get('基金代码', '')).strip(),
-                        'name': str(row.get('基金简称', '')).strip(),
-                        'type': str(row.get('基金类型', '')).strip() if pd.notna(row.get('基金类型')) else '',
-                        'net_value': 0,
-                        'daily_growth': 0,
-                        'total_value': 0
-                    }
-                    
-                    if fund_info['code'] and fund_info['name']:
-                        fund_list.append(fund_info)
-                except:
-                    continue
+            fund_table = FundTable.from_dataframe(fund_df)
+            version = self._update_version(fund_table)
             
             with self._lock:
-                self._cache['data'] = fund_list
+                self._cache['data'] = fund_table
                 self._cache['timestamp'] = time.time()
+                self._cache['version'] = version
             
-            print(f"成功获取 {len(fund_list)} 只基金数据，"
+            print(f"成功获取 {len(fund_table)} 只基金数据，"
                   f"缓存更新时间: {datetime.fromtimestamp(self._cache['timestamp']).strftime('%Y-%m-%d %H:%M:%S')}")
+            self._notify_refresh()
             return True
             
         except Exception as e:
@@ -102,6 +328,120 @@ class FundCacheService:
             print(traceback.format_exc())
             return False
     
+    def _load_version_state(self) -> Optional[Dict[str, Any]]:
+        """加载持久化的版本快照（进程重启后继续版本序列）"""
+        try:
+            with open(self._version_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"加载基金列表版本快照失败: {e}")
+            return None
+    
+    def _save_version_state(self, version: int, rows: List[Tuple[str, str, str]]):
+        """持久化当前版本快照和差异历史（先写临时文件再替换）"""
+        try:
+            os.makedirs(Config.DATA_DIR, exist_ok=True)
+            state = {
+                'version': version,
+                'timestamp': time.time(),
+                'rows': rows,
+                'diffs': self._diffs
+            }
+            tmp_path = f"{self._version_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self._version_path)
+        except Exception as e:
+            print(f"保存基金列表版本快照失败: {e}")
+    
+    def _update_version(self, fund_table: 'FundTable') -> int:
+        """与上一版本快照比较，内容有变化时生成新版本并记录差异
+        
+        多个进程各自刷新基金列表时版本号以持久化文件为准：在文件锁内重新读取最新快照后再递增，
+        避免不同进程生成相同的版本号却对应不同的差异
+        """
+        new_rows = fund_table.rows()
+        with file_lock(self._version_path):
+            state = self._load_version_state()
+            if state:
+                version = int(state.get('version', 0))
+                old_rows = [tuple(row) for row in state.get('rows', [])]
+                diffs = state.get('diffs', [])
+            else:
+                # 没有持久化快照（首次运行或保存失败）时以进程内的版本为准
+                with self._lock:
+                    previous = self._cache['data']
+                    version = self._cache['version']
+                    diffs = list(self._diffs)
+                old_rows = previous.rows() if previous is not None else None
+            
+            if old_rows is None:
+                version += 1
+                self._diffs = diffs
+                self._save_version_state(version, new_rows)
+                return version
+            
+            diff = _diff_rows(old_rows, new_rows)
+            if not any(diff.values()):
+                self._diffs = diffs
+                return version
+            
+            diff.update({'from': version, 'to': version + 1, 'timestamp': time.time()})
+            self._diffs = (diffs + [diff])[-Config.FUND_LIST_MAX_DIFFS:]
+            version += 1
+            self._save_version_state(version, new_rows)
+        print(f"基金列表版本更新为 {version}: 新增 {len(diff['added'])}，"
+              f"删除 {len(diff['removed'])}，变更 {len(diff['updated'])}")
+        return version
+    
+    def get_changes(self, since: int) -> Optional[Dict[str, Any]]:
+        """合并 since 版本之后的所有差异，版本过旧或未知时返回None（需全量同步）"""
+        with self._lock:
+            current = self._cache['version']
+            diffs = list(self._diffs)
+        
+        if since == current:
+            return {'version': current, 'added': [], 'removed': [], 'updated': []}
+        
+        chain = [d for d in diffs if d['from'] >= since]
+        if since > current or not chain or chain[0]['from'] != since:
+            return None
+        
+        # 按顺序合并差异：记录每只基金在 since 版本时是否存在以及最新状态
+        existed: Dict[str, bool] = {}
+        latest: Dict[str, Optional[list]] = {}
+        for diff in chain:
+            for row in diff['added']:
+                existed.setdefault(row[0], False)
+                latest[row[0]] = row
+            for row in diff['updated']:
+                existed.setdefault(row[0], True)
+                latest[row[0]] = row
+            for code in diff['removed']:
+                existed.setdefault(code, True)
+                latest[code] = None
+        
+        return {
+            'version': current,
+            'added': [row for code, row in latest.items() if row is not None and not existed[code]],
+            'updated': [row for code, row in latest.items() if row is not None and existed[code]],
+            'removed': [code for code, row in latest.items() if row is None and existed[code]]
+        }
+    
+    def add_refresh_listener(self, callback: Callable[[], None]):
+        """注册基金列表刷新成功后的回调"""
+        self._refresh_listeners.append(callback)
+    
+    def _notify_refresh(self):
+        """通知刷新回调，单个回调失败不影响其他回调"""
+        for callback in self._refresh_listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"基金列表刷新回调执行失败: {e}")
+    
     def _schedule_daily_fetch(self):
         """定时任务：每天0点自动抓取"""
         now = datetime.now()
@@ -130,44 +470,75 @@ class FundCacheService:
             return self._cache['data'] is not None
     
     def get_fund_list(self) -> tuple:
-        """获取基金列表和缓存时间戳"""
+        """获取基金列表（FundTable）和缓存时间戳"""
         with self._lock:
             return self._cache['data'], self._cache['timestamp']
     
-    def search_funds(self, query: str = '', limit: int = 20) -> List[Dict]:
+    @property
+    def version(self) -> int:
+        """缓存版本号，基金列表内容变化时递增"""
+        with self._lock:
+            return self._cache['version']
+    
+    def _count(self, hit: bool):
+        with self._lock:
+            self._stats['hits' if hit else 'misses'] += 1
+    
+    def get_fund(self, code: str) -> Optional[Dict]:
+        """按基金代码获取基金信息"""
+        fund_table, _ = self.get_fund_list()
+        i = fund_table.find(code) if fund_table is not None else None
+        self._count(i is not None)
+        return fund_table.record(i) if i is not None else None
+    
+    def search_funds(self, query: str = '', limit: int = 20, types: Iterable[str] = None) -> List[Dict]:
         """搜索基金"""
-        fund_list, _ = self.get_fund_list()
-        
-        if fund_list is None:
-            return []
-        
-        if not query:
-            return fund_list[:limit]
-        
-        query_lower = query.lower()
-        filtered_funds = []
+        return self.search_funds_faceted(query, limit, types)['funds']
+    
+    def search_funds_faceted(self, query: str = '', limit: int = 20, types: Iterable[str] = None) -> Dict:
+        """搜索基金，同时返回匹配总数和类型分面计数"""
+        fund_table, _ = self.get_fund_list()
+        self._count(fund_table is not None)
         
-        for fund in fund_list:
-            if (query_lower in fund['code'].lower() or 
-                query_lower in fund['name'].lower()):
-                filtered_funds.append(fund)
+        if fund_table is None:
+            return {'funds': [], 'matched_count': 0, 'facets': {'types': {}, 'categories': {}}}
         
-        # 按匹配度排序
-        def sort_key(fund):
-            code_lower = fund['code'].lower()
-            name_lower = fund['name'].lower()
-            
-            if code_lower == query_lower:
-                return (0, fund['code'])
-            elif code_lower.startswith(query_lower):
-                return (1, fund['code'])
-            elif name_lower.startswith(query_lower):
-                return (2, fund['name'])
-            else:
-                return (3, fund['name'])
+        indices, matched_count, facets = fund_table.search(query, limit, types)
+        return {
+            'funds': [fund_table.record(i) for i in indices],
+            'matched_count': matched_count,
+            'facets': facets
+        }
+    
+    def refresh(self) -> bool:
+        """立即重新抓取基金列表"""
+        return self._fetch_fund_list()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """缓存状态快照（用于健康检查和管理接口）"""
+        with self._lock:
+            fund_table = self._cache['data']
+            timestamp = self._cache['timestamp']
+            version = self._cache['version']
+            stats = dict(self._stats)
+            last_refresh = dict(self._last_refresh)
+            refresh_count = self._refresh_count
+            diffs = len(self._diffs)
         
-        filtered_funds.sort(key=sort_key)
-        return filtered_funds[:limit]
+        lookups = stats['hits'] + stats['misses']
+        if last_refresh['started_at']:
+            last_refresh['started_at'] = datetime.fromtimestamp(last_refresh['started_at']).strftime('%Y-%m-%d %H:%M:%S')
+        return {
+            'entries': len(fund_table) if fund_table is not None else 0,
+            'bytes': fund_table.nbytes if fund_table is not None else 0,
+            'version': version,
+            'diffs': diffs,
+            'updated_at': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None,
+            'refresh_count': refresh_count,
+            'last_refresh': last_refresh,
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None
+        }
 
 
 # 全局基金缓存服务实例
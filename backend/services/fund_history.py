@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金历史数据服务模块
+将抓取到的基金历史净值以有序的纪元日数组保存在进程内（按最近使用保留 FUND_HISTORY_MAX_CODES 只），
+日期区间查询通过二分查找切片完成（视图，无拷贝）
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, List, Tuple, Any
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from config import Config
+from services.circuit_breaker import akshare_breaker, CircuitOpenError
+from services.fund_cache import fund_cache
+from services.trading_calendar import trading_calendar
+from services.upstream import upstream_executor, UpstreamBusyError
+from utils.file_lock import file_lock
+
+
+# 候选列名（按优先级）
+DATE_COLUMNS = ['净值日期', '日期', 'date']
+GROWTH_COLUMNS = ['日增长率', 'daily_growth', '涨跌幅']
+NET_VALUE_COLUMNS = ['单位净值', 'net_value', '收盘']
+
+# ETF接口需要显式日期区间，缓存时取全量历史
+ETF_HISTORY_START = '19900101'
+
+# 数据源：开放式基金 / 场内ETF
+SOURCE_OPEN = 'open'
+SOURCE_ETF = 'etf'
+SOURCES = (SOURCE_OPEN, SOURCE_ETF)
+
+# 基金代码 -> 可用数据源 的持久化文件
+SOURCE_MAP_FILE = 'fund_sources.json'
+
+# 本地历史数据目录（DATA_DIR 下，每只基金一个 .npz 文件）
+HISTORY_DIR = 'history'
+
+
+class FundDataError(Exception):
+    """基金数据格式错误"""
+    pass
+
+
+class UpstreamUnavailableError(Exception):
+    """上游数据源不可用（网络故障或熔断中）"""
+    pass
+
+
+def _find_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
+    """按优先级查找存在的列名"""
+    for col in candidates:
+        if col in df.columns:
+            return col
+    return None
+
+
+def to_epoch_day(date_str: str) -> int:
+    """YYYYMMDD 转换为纪元日（1970-01-01 起的天数）"""
+    return int(np.datetime64(datetime.strptime(date_str, '%Y%m%d').date(), 'D').astype(np.int64))
+
+
+def from_epoch_day(day: int) -> str:
+    """纪元日转换为 YYYYMMDD"""
+    return str(np.datetime64(int(day), 'D')).replace('-', '')
+
+
+def last_publication_time(now: datetime = None) -> datetime:
+    """最近一次净值发布时间（交易日的 FUND_NAV_PUBLISH_TIME）"""
+    return trading_calendar.last_publication_time(now)
+
+
+def _fetch_key(code: str) -> str:
+    """上游执行器中的抓取任务key（相同基金的抓取合并执行）"""
+    return f'fund_history:{code}'
+
+
+def _looks_like_etf(fund: Dict) -> bool:
+    """根据基金列表中的名称/类型判断是否为场内ETF（联接基金属于开放式基金）"""
+    name = fund.get('name', '')
+    fund_type = fund.get('type', '')
+    if '联接' in name:
+        return False
+    return 'ETF' in name.upper() or 'ETF' in fund_type.upper()
+
+
+class FundSeries:
+    """单只基金的历史序列（按日期升序的平行数组）"""
+    
+    __slots__ = ('code', 'days', 'dates', 'growth', 'net_value', 'fetched_at')
+    
+    def __init__(self, code: str, days: np.ndarray, growth: np.ndarray,
+                 net_value: np.ndarray, fetched_at: float = None, dates: np.ndarray = None):
+        self.code = code
+        self.days = days
+        if dates is None:
+            dates = np.datetime_as_string(days.astype('datetime64[D]'), unit='D')
+        self.dates = dates
+        self.growth = growth
+        self.net_value = net_value
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+    
+    @classmethod
+    def from_dataframe(cls, code: str, df: pd.DataFrame) -> 'FundSeries':
+        """从AKShare返回的DataFrame构建序列"""
+        date_column = _find_column(df, DATE_COLUMNS)
+        if not date_column:
+            raise FundDataError('数据中没有找到日期列')
+        
+        growth_column = _find_column(df, GROWTH_COLUMNS)
+        if not growth_column:
+            raise FundDataError('数据中没有找到日增长率列')
+        
+        net_value_column = _find_column(df, NET_VALUE_COLUMNS)
+        
+        days = pd.to_datetime(df[date_column]).to_numpy().astype('datetime64[D]').astype(np.int32)
+        growth = pd.to_numeric(df[growth_column], errors='coerce').to_numpy(dtype=np.float64)
+        if net_value_column:
+            net_value = pd.to_numeric(df[net_value_column], errors='coerce').to_numpy(dtype=np.float64)
+        else:
+            net_value = np.full(len(days), np.nan)
+        
+        # 仅在构建时排序并去重一次，之后的查询全部基于有序数组
+        order = np.argsort(days, kind='stable')
+        days, growth, net_value = days[order], growth[order], net_value[order]
+        if len(days) > 1:
+            keep = np.empty(len(days), dtype=bool)
+            keep[:-1] = days[1:] != days[:-1]
+            keep[-1] = True
+            days, growth, net_value = days[keep], growth[keep], net_value[keep]
+        
+        return cls(code, days, growth, net_value)
+    
+    def __len__(self) -> int:
+        return len(self.days)
+    
+    @property
+    def last_day(self) -> Optional[int]:
+        """最后一个净值日期（纪元日）"""
+        return int(self.days[-1]) if len(self.days) else None
+    
+    def merged(self, tail: Optional['FundSeries']) -> 'FundSeries':
+        """合并增量数据：只追加晚于当前最后日期的行，已有行保持不变"""
+        start = 0
+        if tail is not None and len(tail) and self.last_day is not None:
+            start = int(np.searchsorted(tail.days, self.last_day, side='right'))
+        if tail is None or start >= len(tail):
+            # 没有新数据时保持原抓取时间，避免未更新的数据被当作最新
+            return self
+        return FundSeries(
+            self.code,
+            np.concatenate([self.days, tail.days[start:]]),
+            np.concatenate([self.growth, tail.growth[start:]]),
+            np.concatenate([self.net_value, tail.net_value[start:]]),
+            dates=np.concatenate([self.dates, tail.dates[start:]])
+        )
+    
+    def bounds(self, start_day: int, end_day: int) -> Tuple[int, int]:
+        """二分查找 [start_day, end_day] 对应的下标区间"""
+        lo = int(np.searchsorted(self.days, start_day, side='left'))
+        hi = int(np.searchsorted(self.days, end_day, side='right'))
+        return lo, max(lo, hi)
+    
+    def window(self, start_day: int, end_day: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回日期区间内的 (dates, growth, net_value) 视图"""
+        lo, hi = self.bounds(start_day, end_day)
+        return self.dates[lo:hi], self.growth[lo:hi], self.net_value[lo:hi]
+    
+    def to_records(self, start_day: int, end_day: int) -> List[Dict]:
+        """将日期区间内的数据转换为接口返回格式，开销只与区间大小相关"""
+        dates, growth, net_value = self.window(start_day, end_day)
+        result = []
+        for date, g, nv in zip(dates.tolist(), growth.tolist(), net_value.tolist()):
+            item = {
+                'date': date,
+                'daily_growth': g if g == g else 0.0
+            }
+            if nv == nv:
+                item['net_value'] = nv
+            result.append(item)
+        return result
+
+
+def align_series(series_map: Dict[str, FundSeries], start_day: int, end_day: int,
+                 field: str = 'growth', join: str = 'outer', fill: str = 'none') -> pd.DataFrame:
+    """将多只基金的区间数据按日期对齐为 日期×基金 的矩阵
+    
+    Args:
+        series_map: 基金代码 -> 序列（保持传入顺序作为列顺序）
+        field: growth（日增长率）或 net_value（单位净值）
+        join: outer 取所有基金日期的并集，inner 只保留共同交易日
+        fill: none 保留缺失值，ffill 向前填充，zero 填充为0
+    """
+    columns = {}
+    for code, series in series_map.items():
+        lo, hi = series.bounds(start_day, end_day)
+        values = series.growth if field == 'growth' else series.net_value
+        columns[code] = pd.Series(values[lo:hi], index=series.days[lo:hi])
+    
+    if not columns:
+        return pd.DataFrame()
+    
+    matrix = pd.concat(columns, axis=1, join=join, sort=True)
+    if fill == 'ffill':
+        matrix = matrix.ffill()
+    elif fill == 'zero':
+        matrix = matrix.fillna(0.0)
+    return matrix
+
+
+class FundHistoryService:
+    """基金历史数据服务类"""
+    
+    _instance: Optional['FundHistoryService'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        # 按最近使用排序（LRU），超出上限时淘汰最久未用的序列，需要时从本地存储重新加载
+        self._series: 'OrderedDict[str, FundSeries]' = OrderedDict()
+        self._sources: Dict[str, str] = {}
+        self._sources_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._source_path = os.path.join(Config.DATA_DIR, SOURCE_MAP_FILE)
+        self._history_dir = os.path.join(Config.DATA_DIR, HISTORY_DIR)
+        self._stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0
+        }
+        if self._load_sources():
+            print(f"✓ 已加载 {len(self._sources)} 条基金数据源映射")
+        self._init_done = True
+        # gunicorn preload 时子进程可能复制到被父进程线程（如预热）持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def _read_sources(self) -> Dict[str, str]:
+        """读取持久化的数据源映射"""
+        with open(self._source_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {k: v for k, v in data.items() if v in SOURCES}
+    
+    def _load_sources(self) -> bool:
+        """合并持久化文件中的数据源映射（文件未变化时跳过），返回是否重新读取"""
+        try:
+            mtime = os.path.getmtime(self._source_path)
+            if mtime == self._sources_mtime:
+                return False
+            data = self._read_sources()
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"加载基金数据源映射失败: {e}")
+            return False
+        with self._lock:
+            self._sources.update(data)
+            self._sources_mtime = mtime
+        return True
+    
+    def _save_sources(self, code: str, source: str):
+        """将学到的数据源合并写入持久化文件
+        
+        多个进程共用同一个文件：在文件锁内重新读取后合并再写入（先写临时文件再替换），
+        不会覆盖其他进程学到的映射
+        """
+        try:
+            with file_lock(self._source_path):
+                try:
+                    stored = self._read_sources()
+                except FileNotFoundError:
+                    stored = {}
+                except Exception as e:
+                    print(f"加载基金数据源映射失败，将重新写入: {e}")
+                    stored = {}
+                with self._lock:
+                    data = {**self._sources, **stored, code: source}
+                tmp_path = f"{self._source_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self._source_path)
+            with self._lock:
+                self._sources.update(data)
+        except Exception as e:
+            print(f"保存基金数据源映射失败: {e}")
+    
+    def _remember_source(self, code: str, source: str):
+        """记录成功的数据源"""
+        with self._lock:
+            if self._sources.get(code) == source:
+                return
+            self._sources[code] = source
+        self._save_sources(code, source)
+    
+    def _known_source(self, code: str) -> Optional[str]:
+        """已学习的数据源；进程内没有时重新加载持久化文件（可能已由其他进程学到）"""
+        with self._lock:
+            known = self._sources.get(code)
+        if known is None and self._load_sources():
+            with self._lock:
+                known = self._sources.get(code)
+        return known
+    
+    def _source_order(self, code: str) -> List[str]:
+        """确定数据源尝试顺序：已学习的来源直接使用，否则按基金信息猜测优先级"""
+        known = self._known_source(code)
+        if known:
+            return [known]
+        
+        fund = fund_cache.get_fund(code)
+        if fund and _looks_like_etf(fund):
+            return [SOURCE_ETF, SOURCE_OPEN]
+        return [SOURCE_OPEN, SOURCE_ETF]
+    
+    def _local_path(self, code: str) -> str:
+        return os.path.join(self._history_dir, f'{code}.npz')
+    
+    def _load_local(self, code: str) -> Optional[FundSeries]:
+        """从本地存储加载序列（进程重启后无需重新抓取全量历史）"""
+        if not code.isalnum():
+            return None
+        try:
+            with np.load(self._local_path(code)) as data:
+                return FundSeries(
+                    code,
+                    data['days'],
+                    data['growth'],
+                    data['net_value'],
+                    fetched_at=float(data['fetched_at'])
+                )
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"加载基金 {code} 本地历史数据失败: {e}")
+            return None
+    
+    def _save_local(self, series: FundSeries):
+        """保存序列到本地存储（先写临时文件再替换，避免写坏）"""
+        if not series.code.isalnum():
+            return
+        try:
+            os.makedirs(self._history_dir, exist_ok=True)
+            path = self._local_path(series.code)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    days=series.days,
+                    growth=series.growth,
+                    net_value=series.net_value,
+                    fetched_at=np.float64(series.fetched_at)
+                )
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"保存基金 {series.code} 本地历史数据失败: {e}")
+    
+    def prune_local(self, keep_codes: List[str]) -> int:
+        """删除不再关注的基金的本地历史数据，返回删除数量"""
+        keep = set(keep_codes)
+        removed = 0
+        try:
+            names = os.listdir(self._history_dir)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            code, ext = os.path.splitext(name)
+            if ext == '.npz' and code not in keep:
+                try:
+                    os.remove(os.path.join(self._history_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+    
+    def _lookup(self, code: str) -> Optional[FundSeries]:
+        """查找进程内缓存，缺失时尝试本地存储"""
+        with self._lock:
+            series = self._series.get(code)
+            if series is not None:
+                self._series.move_to_end(code)
+        if series is None:
+            series = self._load_local(code)
+            if series is not None:
+                self.put(series)
+        return series
+    
+    def get(self, code: str, max_age: float = None) -> Optional[FundSeries]:
+        """获取缓存的序列
+        
+        已包含最近一次净值发布日净值的数据在下次发布前一直有效（预热数据据此生效），
+        否则超过 max_age 秒视为过期
+        """
+        if max_age is None:
+            max_age = Config.FUND_HISTORY_TTL
+        series = self._lookup(code)
+        if series is not None and not self._is_fresh(series, max_age):
+            # 预热可能在其他进程中完成，本地存储中的数据比进程内的更新时直接换用
+            local = self._load_local(code)
+            if local is not None and local.fetched_at > series.fetched_at:
+                self.put(local)
+                series = local
+        if series is not None and self._is_fresh(series, max_age):
+            self._count('hits')
+            return series
+        self._count('misses' if series is None else 'expired')
+        return None
+    
+    @staticmethod
+    def _is_fresh(series: FundSeries, max_age: float) -> bool:
+        """按数据本身判断：最后净值日期不早于最近一次发布的交易日，或抓取未超过 max_age 秒
+        
+        上游延迟发布时发布时间之后抓取到的仍是旧数据，不能按抓取时间视为最新
+        """
+        published_day = int(np.datetime64(last_publication_time().date(), 'D').astype(np.int64))
+        return ((series.last_day is not None and series.last_day >= published_day)
+                or time.time() - series.fetched_at <= max_age)
+    
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+    
+    def get_stale(self, code: str) -> Optional[FundSeries]:
+        """获取缓存的序列，不检查是否过期（上游不可用时兜底）"""
+        return self._lookup(code)
+    
+    def put(self, series: FundSeries):
+        """写入序列，超出 FUND_HISTORY_MAX_CODES 时淘汰最久未用的序列"""
+        with self._lock:
+            self._series[series.code] = series
+            self._series.move_to_end(series.code)
+            while len(self._series) > max(1, Config.FUND_HISTORY_MAX_CODES):
+                self._series.popitem(last=False)
+                self._stats['evicted'] += 1
+    
+    def _fetch_from_source(self, code: str, source: str, start_date: str = None) -> pd.DataFrame:
+        """从指定数据源抓取历史数据（经过熔断器）
+        
+        ETF接口支持日期区间，传入 start_date 时只抓取尾部；开放式基金接口不支持区间，总是返回全量
+        """
+        if source == SOURCE_ETF:
+            return akshare_breaker.call(
+                ak.fund_etf_fund_info_em,
+                fund=code,
+                start_date=start_date or ETF_HISTORY_START,
+                end_date=datetime.now().strftime('%Y%m%d')
+            )
+        return akshare_breaker.call(ak.fund_open_fund_info_em, symbol=code)
+    
+    def fetch(self, code: str) -> Optional[FundSeries]:
+        """从AKShare抓取全量历史并写入缓存，基金不存在时返回None
+        
+        Raises:
+            UpstreamUnavailableError: 数据源因网络故障或熔断而无法访问
+        """
+        fund_data = None
+        upstream_error = None
+        for source in self._source_order(code):
+            try:
+                fund_data = self._fetch_from_source(code, source)
+            except CircuitOpenError as e:
+                # 熔断中，后续数据源同样不可用
+                upstream_error = e
+                break
+            except Exception as e:
+                print(f"从数据源 {source} 获取基金 {code} 数据失败: {e}")
+                if isinstance(e, akshare_breaker.failure_exceptions):
+                    upstream_error = e
+                continue
+            if fund_data is not None and not fund_data.empty:
+                self._remember_source(code, source)
+                break
+        
+        if fund_data is None or fund_data.empty:
+            if upstream_error is not None:
+                raise UpstreamUnavailableError(str(upstream_error))
+            return None
+        
+        series = FundSeries.from_dataframe(code, fund_data)
+        self.put(series)
+        self._save_local(series)
+        return series
+    
+    def refresh(self, code: str) -> Optional[FundSeries]:
+        """增量刷新：只抓取/合并最后一个净值日期之后的新数据
+        
+        没有已缓存的序列或数据源未知时退化为全量抓取
+        
+        Raises:
+            UpstreamUnavailableError: 数据源因网络故障或熔断而无法访问
+        """
+        current = self.get_stale(code)
+        source = self._known_source(code)
+        if current is None or current.last_day is None or source is None:
+            return self.fetch(code)
+        
+        try:
+            fund_data = self._fetch_from_source(code, source, start_date=from_epoch_day(current.last_day + 1))
+        except CircuitOpenError as e:
+            raise UpstreamUnavailableError(str(e))
+        except akshare_breaker.failure_exceptions as e:
+            raise UpstreamUnavailableError(str(e))
+        
+        tail = None
+        if fund_data is not None and not fund_data.empty:
+            tail = FundSeries.from_dataframe(code, fund_data)
+        series = current.merged(tail)
+        self.put(series)
+        self._save_local(series)
+        return series
+    
+    def get_or_fetch(self, code: str, timeout: float = None) -> Optional[FundSeries]:
+        """优先使用进程内缓存，缺失或过期时通过上游执行器重新抓取
+        
+        Raises:
+            UpstreamPendingError: 抓取未在截止时间内完成（后台继续执行）
+            UpstreamBusyError: 上游任务排队已满
+        """
+        series = self.get(code)
+        if series is not None:
+            return series
+        return upstream_executor.run(_fetch_key(code), self.fetch, code, timeout=timeout)
+    
+    def force_fetch(self, code: str, timeout: float = None) -> Optional[FundSeries]:
+        """忽略缓存立即重新抓取全量历史（与进行中的抓取合并）
+        
+        Raises:
+            UpstreamPendingError: 抓取未在截止时间内完成（后台继续执行）
+            UpstreamBusyError: 上游任务排队已满
+        """
+        upstream_executor.discard(_fetch_key(code))
+        return upstream_executor.run(_fetch_key(code), self.fetch, code, timeout=timeout)
+    
+    def invalidate(self, code: str) -> bool:
+        """删除基金的进程内缓存和本地存储，下一次请求重新抓取；返回是否存在缓存"""
+        with self._lock:
+            existed = self._series.pop(code, None) is not None
+        upstream_executor.discard(_fetch_key(code))
+        if code.isalnum():
+            try:
+                os.remove(self._local_path(code))
+                existed = True
+            except FileNotFoundError:
+                pass
+        return existed
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """缓存状态快照（用于健康检查和管理接口）"""
+        with self._lock:
+            series_list = list(self._series.values())
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses'] + stats['expired']
+        return {
+            'entries': len(series_list),
+            'max_entries': Config.FUND_HISTORY_MAX_CODES,
+            'rows': sum(len(s) for s in series_list),
+            'bytes': sum(s.days.nbytes + s.dates.nbytes + s.growth.nbytes + s.net_value.nbytes
+                         for s in series_list),
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None
+        }
+    
+    def get_many(self, codes: List[str], timeout: float = None) -> Dict[str, Any]:
+        """并发获取多只基金的序列，所有抓取共享同一个截止时间
+        
+        Returns:
+            {'series': {code: FundSeries}, 'stale': [...], 'pending': [...], 'missing': [...]}
+        """
+        if timeout is None:
+            timeout = Config.UPSTREAM_DEADLINE
+        
+        result = {'series': {}, 'stale': [], 'pending': [], 'missing': []}
+        futures = {}
+        for code in codes:
+            series = self.get(code)
+            if series is not None:
+                result['series'][code] = series
+                continue
+            try:
+                futures[code] = upstream_executor.submit(_fetch_key(code), self.fetch, code)
+            except UpstreamBusyError:
+                futures[code] = None
+        
+        deadline = time.monotonic() + timeout
+        for code, future in futures.items():
+            series = None
+            try:
+                if future is None:
+                    raise UpstreamBusyError()
+                series = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                series = self.get_stale(code)
+                if series is None:
+                    result['pending'].append(code)
+                    continue
+                result['stale'].append(code)
+            except (UpstreamUnavailableError, UpstreamBusyError):
+                series = self.get_stale(code)
+                if series is not None:
+                    result['stale'].append(code)
+            except FundDataError:
+                series = None
+            
+            if series is None:
+                result['missing'].append(code)
+            else:
+                result['series'][code] = series
+        
+        return result
+
+
+# 全局基金历史数据服务实例
+fund_history = FundHistoryService()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金历史数据预热服务模块
+按访问频次在基金列表刷新后预先抓取热门基金的历史数据，
+每个交易日净值发布后增量刷新最近请求过的基金
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from config import Config
+from services.circuit_breaker import akshare_breaker
+from services.fund_cache import fund_cache
+from services.fund_history import fund_history
+from services.trading_calendar import trading_calendar
+from utils.file_lock import file_lock
+
+
+# 访问统计共享文件（DATA_DIR 下）：各进程定期合并写入，执行预热的进程从中读取
+ACCESS_FILE = 'fund_access.json'
+
+# 访问计数每天减半一次，使热度跟随近期访问变化
+DECAY_INTERVAL = 86400
+
+
+class FundPrewarmService:
+    """基金历史数据预热服务类
+    
+    gunicorn preload 时预热任务运行在主进程，而访问记录发生在各个 worker，
+    因此访问计数先在本进程累计，由后台线程每 FUND_ACCESS_FLUSH_INTERVAL 秒合并到共享文件，
+    预热时从共享文件读取；预热结果写入本地存储（DATA_DIR/history），各 worker 按需加载
+    """
+    
+    _instance: Optional['FundPrewarmService'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        self._pending_counts: Counter = Counter()
+        self._pending_access: Dict[str, float] = {}
+        self._access_path = os.path.join(Config.DATA_DIR, ACCESS_FILE)
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._worker: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._started = False
+        self._last_run: Dict[str, Any] = {
+            'reason': None,
+            'started_at': None,
+            'finished_at': None,
+            'warmed': 0,
+            'failed': 0
+        }
+        self._next_publication: Optional[datetime] = None
+        self._init_done = True
+        # gunicorn preload 时子进程复制了父进程的锁和未写入的计数，预热任务只在父进程执行
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        """子进程重建锁，丢弃父进程未写入的计数（由父进程写入，避免重复计数）"""
+        self._lock = threading.Lock()
+        self._pending_counts = Counter()
+        self._pending_access = {}
+        self._worker = None
+        self._timer = None
+    
+    def start(self):
+        """启动预热服务：基金列表刷新后及每个交易日净值发布后触发"""
+        if self._started:
+            return
+        self._started = True
+        fund_cache.add_refresh_listener(lambda: self.trigger('fund_list_refresh'))
+        self._schedule_publication_prewarm()
+        print(f"✓ 已启动基金历史数据预热任务（Top {Config.FUND_PREWARM_TOP_N}）")
+    
+    def stop(self):
+        """停止预热服务"""
+        self._started = False
+        self._stop_event.set()
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+    
+    def record_access(self, code: str):
+        """记录一次基金历史数据访问（调用方应只在成功获取数据后记录）"""
+        with self._lock:
+            self._pending_counts[code] += 1
+            self._pending_access[code] = time.time()
+            # 子进程不会继承父进程的线程，每个进程首次记录时启动自己的写入线程
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='fund-access-flush', daemon=True).start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(Config.FUND_ACCESS_FLUSH_INTERVAL)
+            self.flush()
+    
+    def flush(self):
+        """将本进程累计的访问计数合并到共享文件（文件锁保证多进程读-改-写互斥）"""
+        with self._lock:
+            counts, accessed = self._pending_counts, self._pending_access
+            self._pending_counts, self._pending_access = Counter(), {}
+        if not counts:
+            return
+        try:
+            with file_lock(self._access_path):
+                shared = self._load_shared()
+                shared['counts'].update(counts)
+                shared['last_access'].update(accessed)
+                self._compact(shared)
+                self._save_shared(shared)
+        except Exception as e:
+            print(f"保存基金访问统计失败: {e}")
+    
+    def _load_shared(self) -> Dict[str, Any]:
+        """读取共享的访问统计（文件整体替换写入，读取时无需加锁）"""
+        data = {}
+        try:
+            with open(self._access_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"加载基金访问统计失败: {e}")
+        return {
+            'counts': Counter(data.get('counts', {})),
+            'last_access': dict(data.get('last_access', {})),
+            'decayed_at': data.get('decayed_at', time.time())
+        }
+    
+    def _save_shared(self, shared: Dict[str, Any]):
+        """写入共享的访问统计（先写临时文件再替换，避免写坏）"""
+        os.makedirs(Config.DATA_DIR, exist_ok=True)
+        tmp_path = f"{self._access_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'counts': dict(shared['counts']),
+                'last_access': shared['last_access'],
+                'decayed_at': shared['decayed_at']
+            }, f)
+        os.replace(tmp_path, self._access_path)
+    
+    @staticmethod
+    def _compact(shared: Dict[str, Any]):
+        """按 DECAY_INTERVAL 周期将计数减半并清理超出关注期的基金，再限制条目数不超过 FUND_ACCESS_MAX_CODES"""
+        now = time.time()
+        counts, last_access = shared['counts'], shared['last_access']
+        if now - shared['decayed_at'] >= DECAY_INTERVAL:
+            cutoff = now - Config.FUND_WATCH_DAYS * 86400
+            counts = Counter({code: count // 2 for code, count in counts.items() if count >= 2})
+            last_access = {code: t for code, t in last_access.items() if t >= cutoff}
+            shared['decayed_at'] = now
+        limit = Config.FUND_ACCESS_MAX_CODES
+        if len(counts) > limit:
+            counts = Counter(dict(counts.most_common(limit)))
+        if len(last_access) > limit:
+            last_access = dict(sorted(last_access.items(), key=lambda item: -item[1])[:limit])
+        shared['counts'], shared['last_access'] = counts, last_access
+    
+    def _access_stats(self) -> Tuple[Counter, Dict[str, float]]:
+        """共享文件中的访问统计加上本进程尚未写入的部分"""
+        shared = self._load_shared()
+        counts, last_access = shared['counts'], shared['last_access']
+        with self._lock:
+            counts.update(self._pending_counts)
+            last_access.update(self._pending_access)
+        return counts, last_access
+    
+    def top_codes(self, n: int = None) -> List[str]:
+        """访问次数最多的基金代码"""
+        n = n or Config.FUND_PREWARM_TOP_N
+        counts, _ = self._access_stats()
+        return [code for code, _ in counts.most_common(n)]
+    
+    def watched_codes(self) -> List[str]:
+        """最近 FUND_WATCH_DAYS 天内请求过的基金代码（按访问次数降序）"""
+        cutoff = time.time() - Config.FUND_WATCH_DAYS * 86400
+        counts, last_access = self._access_stats()
+        codes = [code for code, t in last_access.items() if t >= cutoff]
+        return sorted(codes, key=lambda c: -counts.get(c, 0))
+    
+    def trigger(self, reason: str):
+        """在后台线程中执行一轮预热（已有预热在进行时忽略）
+        
+        净值发布后增量刷新关注的基金，其他情况全量抓取热门基金
+        """
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._prewarm, args=(reason,), daemon=True)
+            self._worker.start()
+    
+    def _prewarm(self, reason: str):
+        """限速抓取/刷新基金历史数据"""
+        if reason == 'nav_publication':
+            codes = self.watched_codes()
+            load: Callable = fund_history.refresh
+        else:
+            codes = self.top_codes()
+            load = fund_history.fetch
+        if not codes:
+            return
+        
+        print(f"开始预热 {len(codes)} 只基金历史数据（{reason}）...")
+        self._last_run.update({
+            'reason': reason,
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': None,
+            'warmed': 0,
+            'failed': 0
+        })
+        
+        for i, code in enumerate(codes):
+            if self._stop_event.is_set():
+                break
+            if akshare_breaker.is_open:
+                print("上游熔断中，停止本轮预热")
+                break
+            # 限速，避免集中请求触发上游限流
+            if i > 0 and self._stop_event.wait(Config.FUND_PREWARM_INTERVAL):
+                break
+            try:
+                if load(code) is not None:
+                    self._last_run['warmed'] += 1
+            except Exception as e:
+                self._last_run['failed'] += 1
+                print(f"预热基金 {code} 失败: {e}")
+        
+        self._last_run['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if reason == 'nav_publication':
+            fund_history.prune_local(self.watched_codes())
+        print(f"预热完成: 成功 {self._last_run['warmed']}，失败 {self._last_run['failed']}")
+    
+    def _schedule_publication_prewarm(self):
+        """定时任务：按交易日历在下一个交易日净值发布后增量刷新，非交易日不触发"""
+        if not self._started:
+            return
+        
+        now = datetime.now()
+        next_run = trading_calendar.next_publication_time(now)
+        self._next_publication = next_run
+        
+        def task():
+            # Timer可能因系统休眠等原因延后，触发时再次确认当天为交易日
+            if trading_calendar.is_trading_day(datetime.now().date()):
+                self.trigger('nav_publication')
+            self._schedule_publication_prewarm()
+        
+        self._timer = threading.Timer((next_run - now).total_seconds(), task)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        counts, _ = self._access_stats()
+        with self._lock:
+            pending = len(self._pending_counts)
+        return {
+            'tracked_codes': len(counts),
+            'pending_codes': pending,
+            'watched_codes': len(self.watched_codes()),
+            'top_n': Config.FUND_PREWARM_TOP_N,
+            'next_publication': self._next_publication.strftime('%Y-%m-%d %H:%M:%S') if self._next_publication else None,
+            'last_run': dict(self._last_run)
+        }
+
+
+# 全局基金预热服务实例
+fund_prewarmer = FundPrewarmService()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主节点选举模块
+多个进程或主机共用同一个数据库时，通过租约行选出唯一执行轮询的进程
+"""
+
+import os
+import time
+import uuid
+import socket
+import threading
+from typing import Optional, Callable, Dict, Any
+
+from config import Config
+from services.database import db
+
+
+# 租约名称（bi_leader_lease 表的主键）
+LEASE_NAME = 'bi_polling'
+
+# MySQL 表不存在错误码
+ER_NO_SUCH_TABLE = 1146
+
+
+class LeaderElection:
+    """主节点选举类
+    
+    - 每个进程的心跳线程每 BI_LEADER_HEARTBEAT 秒尝试获取或续期租约，
+      租约未过期且持有者不是自己时保持原持有者
+    - 到期时间使用数据库时间，各主机时钟不一致不影响判断
+    - 主节点失联后最多 BI_LEADER_LEASE 秒租约过期，其他进程接管
+    - 续期失败且本地记录的租约即将过期时主动卸任，避免两个进程同时轮询
+    """
+    
+    _instance: Optional['LeaderElection'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        self.identity = self._new_identity()
+        self._is_leader = False
+        self._lease_deadline = 0.0
+        self._on_elected: Optional[Callable[[], None]] = None
+        self._on_demoted: Optional[Callable[[], None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._init_done = True
+        # gunicorn preload 时子进程复制了父进程的状态，但心跳线程不会随之复制
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    @staticmethod
+    def _new_identity() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def _reset_after_fork(self):
+        """子进程不是主节点，也没有心跳线程"""
+        self.identity = self._new_identity()
+        self._is_leader = False
+        self._lease_deadline = 0.0
+        self._thread = None
+        self._stop_event = threading.Event()
+    
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader
+    
+    def start(self, on_elected: Callable[[], None], on_demoted: Callable[[], None]):
+        """启动心跳线程，成为主节点时调用 on_elected，失去主节点身份时调用 on_demoted"""
+        if self._thread is not None:
+            return
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name='leader-election', daemon=True)
+        self._thread.start()
+        print(f"✓ 已启动轮询主节点选举（{self.identity}）")
+    
+    def stop(self):
+        """停止心跳并释放租约"""
+        self._stop_event.set()
+        self._thread = None
+        if self._is_leader:
+            self._set_leader(False)
+            try:
+                db.execute_modify(
+                    "UPDATE bi_leader_lease SET expires_at = NOW(3) WHERE name = %s AND holder = %s",
+                    (LEASE_NAME, self.identity)
+                )
+            except Exception as e:
+                print(f"释放轮询租约失败: {e}")
+    
+    def _heartbeat_loop(self):
+        while not self._stop_event.is_set():
+            self._renew()
+            self._stop_event.wait(Config.BI_LEADER_HEARTBEAT)
+    
+    def _renew(self):
+        """获取或续期租约（单条语句原子完成）"""
+        try:
+            # holder 先于 expires_at 赋值：只有原持有者是自己或租约已过期时两列才被更新
+            db.execute_modify("""
+                INSERT INTO bi_leader_lease (name, holder, expires_at)
+                VALUES (%s, %s, NOW(3) + INTERVAL %s SECOND)
+                ON DUPLICATE KEY UPDATE
+                    holder = IF(holder = VALUES(holder) OR expires_at < NOW(3), VALUES(holder), holder),
+                    expires_at = IF(holder = VALUES(holder), VALUES(expires_at), expires_at)
+            """, (LEASE_NAME, self.identity, Config.BI_LEADER_LEASE))
+            row = db.execute_query(
+                "SELECT holder FROM bi_leader_lease WHERE name = %s", (LEASE_NAME,), fetch_one=True
+            )
+        except Exception as e:
+            if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+                # 未执行建表脚本时保持升级前的行为：每个进程都轮询
+                if not self._is_leader:
+                    print("⚠️ bi_leader_lease 表不存在，跳过主节点选举（请执行 sql/bi_tables.sql）")
+                self._lease_deadline = float('inf')
+                self._set_leader(True)
+                return
+            print(f"轮询租约续期失败: {e}")
+            if self._is_leader and time.monotonic() >= self._lease_deadline - Config.BI_LEADER_HEARTBEAT:
+                print("⚠️ 无法确认轮询租约，主动卸任")
+                self._set_leader(False)
+            return
+        
+        if row and row['holder'] == self.identity:
+            self._lease_deadline = time.monotonic() + Config.BI_LEADER_LEASE
+            self._set_leader(True)
+        else:
+            self._set_leader(False)
+    
+    def _set_leader(self, leader: bool):
+        if leader == self._is_leader:
+            return
+        self._is_leader = leader
+        if leader:
+            print(f"✓ 当前进程成为轮询主节点（{self.identity}）")
+            callback = self._on_elected
+        else:
+            print(f"⚠️ 当前进程不再是轮询主节点（{self.identity}）")
+            callback = self._on_demoted
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                print(f"主节点切换回调失败: {e}")
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """选举状态快照（主节点身份以数据库中的租约为准）"""
+        result = {
+            'identity': self.identity,
+            'is_leader': self._is_leader,
+            'leader': None,
+            'lease_expires_in': None
+        }
+        try:
+            row = db.execute_query("""
+                SELECT holder, TIMESTAMPDIFF(MICROSECOND, NOW(3), expires_at) AS remaining
+                FROM bi_leader_lease WHERE name = %s
+            """, (LEASE_NAME,), fetch_one=True)
+        except Exception as e:
+            result['error'] = str(e)
+            return result
+        if row and row['remaining'] is not None and row['remaining'] > 0:
+            result['leader'] = row['holder']
+            result['lease_expires_in'] = round(row['remaining'] / 1e6, 1)
+        return result
+
+
+# 全局主节点选举实例
+leader_election = LeaderElection()
@@ -5,20 +5,67 @@
 B站动态和评论的后台轮询
 """
 
+import os
 import json
+import math
 import time
+import heapq
+import random
+import itertools
 import threading
 import traceback
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Mapping, Tuple, Any
 
+from config import Config
 from services.database import db
+from services.read_ids import read_id_cache
+from services.settings import settings_cache
 from utils.wbi import get_signed_params
+from utils.http import dingtalk_session
+from utils.rate_limit import bili_get, bili_limiter
+
+
+# 子回复每页条数和每个评论线程每轮最多抓取的页数
+SUB_REPLY_PAGE_SIZE = 50
+SUB_REPLY_MAX_PAGES = 5
+
+# 轮询目标（UP主列表、最新动态）的同步间隔(秒)
+TARGET_SYNC_INTERVAL = 60
+
+# 自适应轮询间隔（相对设置中的轮询间隔）：有新内容后缩短到下限，空闲时逐次放大到上限
+ACTIVE_INTERVAL_FACTOR = 0.25
+IDLE_INTERVAL_FACTOR = 4
+IDLE_BACKOFF = 1.5
+
+
+class PollTarget:
+    """轮询目标：一个UP主的动态（'up', mid）或一个动态的评论（'comment', dynamic_id）"""
+    
+    __slots__ = ('key', 'payload', 'interval', 'due')
+    
+    def __init__(self, key: Tuple[str, str], payload: Dict, interval: float, due: float):
+        self.key = key
+        self.payload = payload
+        self.interval = interval
+        self.due = due
+    
+    @property
+    def kind(self) -> str:
+        return self.key[0]
 
 
 class PollingService:
-    """后台轮询服务"""
+    """后台轮询服务
+    
+    单个调度线程维护按到期时间排序的堆，每个UP主和每个最新动态各是一个轮询目标：
+    - 到期的目标交给有界线程池执行，执行完成后按活跃度计算下一次到期时间
+    - 有新内容时间隔缩短到下限，空闲时逐次放大到上限
+    - 每分钟实际发出的B站请求数不超过 BI_POLL_BUDGET（一个目标可能翻多页或抓取多页子回复），
+      目标较多时间隔下限按每个目标的平均请求数随之提高
+    """
     
     _instance: Optional['PollingService'] = None
     
@@ -31,12 +78,59 @@ class PollingService:
         if hasattr(self, '_init_done') and self._init_done:
             return
         
-        self.dynamic_timer: Optional[threading.Timer] = None
-        self.comment_timer: Optional[threading.Timer] = None
-        self.is_polling_dynamics = False
-        self.is_polling_comments = False
         self._running = False
+        # 实际启动轮询的进程ID（gunicorn preload 时子进程会复制父进程的状态）
+        self._owner_pid: Optional[int] = None
+        # 每次启动递增，旧调度线程和执行中的旧任务据此退出
+        self._generation = 0
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._sub_reply_executor: Optional[ThreadPoolExecutor] = None
+        # 保护以下调度状态，调度线程在其上等待
+        self._cond = threading.Condition()
+        # 堆元素：(到期时间, 序号, 目标键)；目标重新调度后旧元素按到期时间不一致丢弃
+        self._heap: List[Tuple[float, int, Tuple[str, str]]] = []
+        self._seq = itertools.count()
+        self._targets: Dict[Tuple[str, str], PollTarget] = {}
+        self._ups_map: Dict[str, Dict] = {}
+        self._next_sync = 0.0
+        # 最近一分钟内的调度时间，与同期发出的请求数一起估算每个目标的平均请求数
+        self._dispatched: deque = deque()
+        # 已调度但尚未完成的目标数（按平均请求数预留预算）
+        self._inflight = 0
+        self._cost_per_run = 1.0
+        # 评论指纹缓存：dynamic_id -> {comment_id: 指纹}，只保留当前轮询范围内的动态
+        self._comment_fingerprints: Dict[str, Dict[str, int]] = {}
+        # 子回复数：dynamic_id -> {根评论ID: 已抓取的回复数}，只在回复数增长时抓取尾部页
+        self._reply_counts: Dict[str, Dict[str, int]] = {}
+        # 评论线程游标：dynamic_id -> (评论总数, 最新根评论rpid, 置顶评论rpid)，未变化时整个动态跳过
+        self._comment_cursors: Dict[str, Tuple[int, int, int]] = {}
+        # 动态高水位：mid -> (pub_ts, 动态ID)，首次轮询时从 bi_up_cursors 加载
+        self._high_water: Optional[Dict[str, Tuple[int, int]]] = None
+        settings_cache.subscribe(self._on_settings_changed)
         self._init_done = True
+        # gunicorn preload 时子进程复制了父进程的调度状态和锁，但调度线程和线程池不会随之复制
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        """子进程未启动轮询：重建锁，清空调度状态和进程内缓存（成为主节点后从数据库重新加载）"""
+        self._running = False
+        self._owner_pid = None
+        self._generation += 1
+        self._thread = None
+        self._executor = None
+        self._sub_reply_executor = None
+        self._cond = threading.Condition()
+        self._heap = []
+        self._targets = {}
+        self._next_sync = 0.0
+        self._dispatched = deque()
+        self._inflight = 0
+        self._cost_per_run = 1.0
+        self._comment_fingerprints = {}
+        self._reply_counts = {}
+        self._comment_cursors = {}
+        self._high_water = None
     
     def start(self):
         """启动轮询服务"""
@@ -47,20 +141,31 @@ class PollingService:
             print("⚠️ 数据库不可用，轮询服务未启动")
             return
         
-        self._running = True
-        self._schedule_dynamic_poll()
-        self._schedule_comment_poll()
+        with self._cond:
+            self._running = True
+            self._owner_pid = os.getpid()
+            self._generation += 1
+            self._next_sync = 0.0
+            generation = self._generation
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.BI_POLL_CONCURRENCY), thread_name_prefix='poll'
+            )
+        self._thread = threading.Thread(
+            target=self._scheduler_loop, args=(generation,), name='poll-scheduler', daemon=True
+        )
+        self._thread.start()
         print("✓ 轮询服务已启动")
     
     def stop(self):
-        """停止轮询服务"""
-        self._running = False
-        if self.dynamic_timer:
-            self.dynamic_timer.cancel()
-            self.dynamic_timer = None
-        if self.comment_timer:
-            self.comment_timer.cancel()
-            self.comment_timer = None
+        """停止轮询服务（执行中的任务完成后不再调度）"""
+        with self._cond:
+            self._running = False
+            self._generation += 1
+            self._heap.clear()
+            self._targets.clear()
+            self._cond.notify_all()
+        self._thread = None
         print("✓ 轮询服务已停止")
     
     def restart(self):
@@ -68,264 +173,401 @@ class PollingService:
         self.stop()
         self.start()
     
-    def _get_settings(self) -> Dict:
-        """获取设置"""
-        sql = "SELECT * FROM bi_settings WHERE id = 1"
-        row = db.execute_query(sql, fetch_one=True)
-        return row if row else {}
+    def _get_settings(self) -> Mapping[str, Any]:
+        """获取设置（内存中的只读快照）"""
+        return settings_cache.get()
+    
+    def _on_settings_changed(self, old: Mapping[str, Any], new: Mapping[str, Any]):
+        """设置变化时按新的轮询间隔重新调度（Cookie、钉钉等设置在下一次轮询直接生效）"""
+        keys = ('enable_dynamic_polling', 'dynamic_polling_interval',
+                'enable_comment_polling', 'comment_polling_interval', 'comment_time_range')
+        # 只有本进程启动的轮询需要重新调度，其他进程保存设置后不会因此各自启动轮询
+        if self._running and self._owner_pid == os.getpid() and any(old.get(k) != new.get(k) for k in keys):
+            self.restart()
     
     def _get_ups(self) -> List[Dict]:
         """获取UP列表"""
         sql = "SELECT mid, name, face FROM bi_ups"
         return db.execute_query(sql)
     
-    def _schedule_dynamic_poll(self):
-        """调度动态轮询"""
-        if not self._running:
-            return
-        
-        settings = self._get_settings()
-        interval = int(settings.get('dynamic_polling_interval', 5)) * 60
-        def poll_task():
-            # 每次执行时重新读取设置，确保开关状态是最新的
-            current_settings = self._get_settings()
-            if self._running and current_settings.get('enable_dynamic_polling'):
-                self._poll_dynamics()
-            self._schedule_dynamic_poll()
-        
-        self.dynamic_timer = threading.Timer(interval, poll_task)
-        self.dynamic_timer.daemon = True
-        self.dynamic_timer.start()
-    
-    def _schedule_comment_poll(self):
-        """调度评论轮询"""
-        if not self._running:
-            return
-        
-        settings = self._get_settings()
-        interval = int(settings.get('comment_polling_interval', 5)) * 60
-        
-        def poll_task():
-            # 每次执行时重新读取设置，确保开关状态是最新的
-            current_settings = self._get_settings()
-            if self._running and current_settings.get('enable_comment_polling'):
-                self._poll_comments()
-            self._schedule_comment_poll()
-
-        self.comment_timer = threading.Timer(interval, poll_task)
-        self.comment_timer.daemon = True
-        self.comment_timer.start()
+    def _get_recent_dynamics(self, count: int) -> List[Dict]:
+        """获取每个UP主最新的 count 条动态（评论轮询范围）"""
+        sql = """
+            SELECT dynamic_id, mid, comment_oid, comment_type, title, description, jump_url, timestamp
+            FROM (
+                SELECT dynamic_id, mid, comment_oid, comment_type, title, description, jump_url, timestamp,
+                       ROW_NUMBER() OVER (PARTITION BY mid ORDER BY timestamp DESC) as rn
+                FROM bi_dynamics
+            ) ranked
+            WHERE rn <= %s
+            ORDER BY timestamp DESC
+        """
+        return db.execute_query(sql, (count,))
     
-    def _poll_dynamics(self):
-        """轮询动态"""
-        if self.is_polling_dynamics:
-            return
-        
+    @staticmethod
+    def _base_interval(kind: str, settings: Mapping[str, Any]) -> float:
+        """设置中的轮询间隔(秒)"""
+        key = 'dynamic_polling_interval' if kind == 'up' else 'comment_polling_interval'
+        return max(1, int(settings.get(key) or 5)) * 60
+    
+    def _sync_targets(self, generation: int):
+        """同步轮询目标：新增的UP主和动态在一个轮询间隔内错开加入，移除的目标不再调度"""
         settings = self._get_settings()
-        cookie = settings.get('cookie')
-        if not cookie:
-            return
-        
-        self.is_polling_dynamics = True
-        try:
-            ups = self._get_ups()
-            new_count = 0
-            
+        ups = self._get_ups()
+        wanted: Dict[Tuple[str, str], Dict] = {}
+        if settings.get('enable_dynamic_polling'):
+            self._load_high_water()
             for up in ups:
+                wanted[('up', up['mid'])] = up
+        if settings.get('enable_comment_polling'):
+            for d in self._get_recent_dynamics(int(settings.get('comment_time_range', 5))):
+                wanted[('comment', d['dynamic_id'])] = d
+        
+        now = time.time()
+        with self._cond:
+            if generation != self._generation:
+                return
+            self._ups_map = {u['mid']: u for u in ups}
+            for key in list(self._targets):
+                if key not in wanted:
+                    del self._targets[key]
+            for key, payload in wanted.items():
+                target = self._targets.get(key)
+                if target is not None:
+                    target.payload = payload
+                    continue
+                interval = self._base_interval(key[0], settings)
+                target = PollTarget(key, payload, interval, now + random.uniform(0, interval))
+                self._targets[key] = target
+                heapq.heappush(self._heap, (target.due, next(self._seq), key))
+            self._cond.notify()
+        
+        # 超出轮询范围的动态不再需要指纹和游标
+        polled = {key[1] for key in wanted if key[0] == 'comment'}
+        for dynamic_id in list(self._comment_fingerprints) + list(self._comment_cursors):
+            if dynamic_id not in polled:
+                self._forget_comment_state(dynamic_id)
+    
+    def _budget_wait(self, now: float) -> float:
+        """距离下一次可用请求预算的秒数（调用方持有锁）
+        
+        预算按一分钟内实际发出的B站请求数计算，已调度未完成的目标按平均请求数预留
+        """
+        while self._dispatched and now - self._dispatched[0] >= 60:
+            self._dispatched.popleft()
+        sent, oldest = bili_limiter.recent_sent()
+        if self._dispatched:
+            self._cost_per_run = max(1.0, sent / len(self._dispatched))
+        if sent + self._inflight * self._cost_per_run < Config.BI_POLL_BUDGET:
+            return 0.0
+        # 等待窗口内最早的请求移出窗口（目标执行完成时也会唤醒调度线程）
+        return max(0.1, oldest + 60 - now) if oldest is not None else 1.0
+    
+    def _scheduler_loop(self, generation: int):
+        """调度线程：定期同步目标，按到期时间和预算把目标交给线程池"""
+        while True:
+            if time.time() >= self._next_sync:
                 try:
-                    dynamics = self._fetch_dynamics(up['mid'], cookie)
-                    for d in dynamics:
-                        if self._save_dynamic(d, up):
-                            new_count += 1
-                            if settings.get('dingtalk_access_token'):
-                                self._send_dingtalk(
-                                    type_='新动态',
-                                    up_name=up['name'],
-                                    content=d.get('title') or d.get('description', ''),
-                                    jump_url=d.get('jumpUrl', ''),
-                                    timestamp=int(d.get('timestamp', time.time())),
-                                    settings=settings
-                                )
+                    self._sync_targets(generation)
                 except Exception as e:
-                    print(f"轮询UP {up['name']} 动态失败: {e}")
+                    print(f"同步轮询目标失败: {e}")
                     traceback.print_exc()
+                    self._log_poll('dynamic', 'failed', str(e), 0)
+                self._next_sync = time.time() + TARGET_SYNC_INTERVAL
             
-            # self._log_poll('dynamic', 'success', f'轮询完成，新增{new_count}条动态', new_count)
-            
-        except Exception as e:
-            print(f"动态轮询失败: {e}")
-            traceback.print_exc()
-            self._log_poll('dynamic', 'failed', str(e), 0)
-        finally:
-            self.is_polling_dynamics = False
+            with self._cond:
+                if generation != self._generation:
+                    return
+                now = time.time()
+                wait = self._next_sync - now
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, key = self._heap[0]
+                    target = self._targets.get(key)
+                    if target is None or target.due != due:
+                        heapq.heappop(self._heap)
+                        continue
+                    budget_wait = self._budget_wait(now)
+                    if budget_wait > 0:
+                        wait = min(wait, budget_wait)
+                        break
+                    heapq.heappop(self._heap)
+                    self._dispatched.append(now)
+                    self._inflight += 1
+                    self._executor.submit(self._run_target, target, generation)
+                else:
+                    if self._heap:
+                        wait = min(wait, self._heap[0][0] - now)
+                self._cond.wait(timeout=max(0.0, wait))
     
-    def _poll_comments(self):
-        """轮询评论"""
-        if self.is_polling_comments:
-            return
-        
+    def _run_target(self, target: PollTarget, generation: int):
+        """执行一个轮询目标，按是否有新内容安排下一次轮询"""
+        activity = 0
         settings = self._get_settings()
-        cookie = settings.get('cookie')
-        if not cookie:
-            return
-        self.is_polling_comments = True
+        if target.kind == 'up':
+            poll_type, label, unit = 'dynamic', f"UP主 {target.payload.get('name') or target.key[1]}", '动态'
+        else:
+            poll_type, label, unit = 'comment', f"动态 {target.key[1]}", '评论'
         try:
-            ups = self._get_ups()
-            ups_map = {u['mid']: u for u in ups}
-            
-            dynamic_count = int(settings.get('comment_time_range', 5))
-            
-            sql = """
-                SELECT dynamic_id, mid, comment_oid, comment_type, title, description, jump_url, timestamp
-                FROM (
-                    SELECT dynamic_id, mid, comment_oid, comment_type, title, description, jump_url, timestamp,
-                           ROW_NUMBER() OVER (PARTITION BY mid ORDER BY timestamp DESC) as rn
-                    FROM bi_dynamics
-                ) ranked
-                WHERE rn <= %s
-                ORDER BY timestamp DESC
-            """
-            dynamics = db.execute_query(sql, (dynamic_count,))
-            new_count = 0
-            for d in dynamics:
-                try:
-                    up = ups_map.get(d['mid'], {})
-                    up_name = up.get('name', '')
-                    
-                    comments = self._fetch_comments(d['comment_oid'], d['comment_type'], cookie)
-                    for c in comments:
-                        is_new = self._save_comment(c, d['dynamic_id'])
-                        if is_new and c.get('userName') == up_name:
-                            new_count += 1
-                            if settings.get('dingtalk_access_token'):
-                                self._send_dingtalk(
-                                    type_='新评论',
-                                    up_name=up_name,
-                                    content=c.get('content', ''),
-                                    jump_url=d['jump_url'] or '',
-                                    timestamp=int(c.get('timestamp', time.time())),
-                                    settings=settings
-                                )
-                        
-                        for reply in c.get('replies', []):
-                            is_new_reply = self._save_comment(reply, d['dynamic_id'], c['id'])
-                            if is_new_reply and reply.get('userName') == up_name:
-                                new_count += 1
-                                if settings.get('dingtalk_access_token'):
-                                    self._send_dingtalk(
-                                        type_='新回复',
-                                        up_name=up_name,
-                                        content=reply.get('content', ''),
-                                        jump_url=d['jump_url'] or '',
-                                        timestamp=int(reply.get('timestamp', time.time())),
-                                        settings=settings
-                                    )
-                except Exception as e:
-                    print(f"轮询动态 {d['dynamic_id']} 评论失败: {e}")
-            
-            # self._log_poll('comment', 'success', f'轮询完成，新增{new_count}条UP主评论', new_count)
-            
+            cookie = settings.get('cookie')
+            if cookie:
+                if target.kind == 'up':
+                    activity = self._poll_up_dynamics(target.payload, cookie, settings)
+                else:
+                    activity = self._poll_dynamic_comments(target.payload, cookie, settings)
+                self._log_poll(poll_type, 'success', f'{label} 轮询完成，新增{activity}条{unit}', activity)
         except Exception as e:
-            print(f"评论轮询失败: {e}")
+            print(f"轮询{label}失败: {e}")
             traceback.print_exc()
-            self._log_poll('comment', 'failed', str(e), 0)
-        finally:
-            self.is_polling_comments = False
+            self._log_poll(poll_type, 'failed', f'{label}: {e}', 0)
+        
+        base = self._base_interval(target.kind, settings)
+        with self._cond:
+            self._inflight = max(0, self._inflight - 1)
+            if generation != self._generation or self._targets.get(target.key) is not target:
+                self._cond.notify()
+                return
+            # 目标数量较多时提高间隔下限，使稳定状态的请求数不超过预算
+            floor = max(base * ACTIVE_INTERVAL_FACTOR,
+                        len(self._targets) * self._cost_per_run * 60 / max(1, Config.BI_POLL_BUDGET))
+            if activity:
+                interval = floor
+            else:
+                interval = min(base * IDLE_INTERVAL_FACTOR, target.interval * IDLE_BACKOFF)
+            target.interval = max(floor, interval)
+            target.due = time.time() + target.interval
+            heapq.heappush(self._heap, (target.due, next(self._seq), target.key))
+            self._cond.notify()
     
-    def _fetch_dynamics(self, mid: str, cookie: str) -> List[Dict]:
-        """从B站API获取动态"""
-        params = {
-            'host_mid': mid,
-            'platform': 'web',
-            'features': 'itemOpusStyle,listOnlyfans,opusBigCover,onlyfansVote,forwardListHidden,decorationCard,commentsNewVersion,onlyfansAssetsV2,ugcDelete,onlyfansQaCard,avatarAutoTheme,sunflowerStyle,cardsEnhance',
-            'web_location': '333.1387'
-        }
-        signed_params = get_signed_params(params, cookie)
+    def snapshot(self) -> Dict[str, Any]:
+        """调度状态快照"""
+        with self._cond:
+            now = time.time()
+            kinds = [t.kind for t in self._targets.values()]
+            intervals = [t.interval for t in self._targets.values()]
+            return {
+                'running': self._running,
+                'up_targets': kinds.count('up'),
+                'comment_targets': kinds.count('comment'),
+                'dispatched_last_minute': sum(1 for t in self._dispatched if now - t < 60),
+                'requests_last_minute': bili_limiter.recent_sent()[0],
+                'requests_per_target': round(self._cost_per_run, 2),
+                'inflight': self._inflight,
+                'budget_per_minute': Config.BI_POLL_BUDGET,
+                'min_interval': round(min(intervals), 1) if intervals else None,
+                'max_interval': round(max(intervals), 1) if intervals else None,
+                'next_due_in': round(max(0.0, self._heap[0][0] - now), 1) if self._heap else None
+            }
+    
+    def _poll_up_dynamics(self, up: Dict, cookie: str, settings: Mapping[str, Any]) -> int:
+        """轮询单个UP主的动态，返回新动态数量（每个UP主是独立的轮询目标，失败不影响其他UP主）"""
+        dynamics = self._fetch_dynamics(up['mid'], cookie, self._high_water.get(up['mid']))
+        new_dynamics = self._save_dynamics(dynamics, up)
+        self._advance_high_water(up['mid'], dynamics)
+        for d in new_dynamics:
+            if settings.get('dingtalk_access_token'):
+                self._send_dingtalk(
+                    type_='新动态',
+                    up_name=up['name'],
+                    content=d.get('title') or d.get('description', ''),
+                    jump_url=d.get('jumpUrl', ''),
+                    timestamp=int(d.get('timestamp', time.time())),
+                    settings=settings
+                )
+        return len(new_dynamics)
+    
+    def _poll_dynamic_comments(self, d: Dict, cookie: str, settings: Mapping[str, Any]) -> int:
+        """轮询单个动态的评论，返回新评论数量（UP主本人的新评论和回复发送通知）"""
+        up_name = self._ups_map.get(d['mid'], {}).get('name', '')
+        try:
+            comments = self._fetch_comments(d['comment_oid'], d['comment_type'], cookie, d['dynamic_id'])
+            new_ids = self._save_comments(comments, d['dynamic_id'])
+        except Exception:
+            # 游标可能已超前于实际保存的数据，丢弃后下一次完整抓取该动态
+            self._forget_comment_state(d['dynamic_id'])
+            raise
+        
+        for c in comments:
+            is_new = c['id'] in new_ids
+            if is_new and c.get('userName') == up_name:
+                if settings.get('dingtalk_access_token'):
+                    self._send_dingtalk(
+                        type_='新评论',
+                        up_name=up_name,
+                        content=c.get('content', ''),
+                        jump_url=d['jump_url'] or '',
+                        timestamp=int(c.get('timestamp', time.time())),
+                        settings=settings
+                    )
+            
+            for reply in c.get('replies', []):
+                is_new_reply = reply['id'] in new_ids
+                if is_new_reply and reply.get('userName') == up_name:
+                    if settings.get('dingtalk_access_token'):
+                        self._send_dingtalk(
+                            type_='新回复',
+                            up_name=up_name,
+                            content=reply.get('content', ''),
+                            jump_url=d['jump_url'] or '',
+                            timestamp=int(reply.get('timestamp', time.time())),
+                            settings=settings
+                        )
+        return len(new_ids)
+    
+    def _fetch_dynamics(self, mid: str, cookie: str, mark: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """从B站API获取高水位之后的动态
         
+        有高水位时沿 offset 游标翻页，直到遇到不晚于高水位的动态（最多 BI_FEED_MAX_PAGES 页），
+        不晚于高水位的动态直接跳过；没有高水位（首次轮询）时只取第一页
+        """
         headers = {
             'Cookie': cookie,
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Referer': 'https://space.bilibili.com'
         }
         
-        resp = requests.get(
-            'https://api.bilibili.com/x/polymer/web-dynamic/v1/feed/space',
-            params=signed_params,
-            headers=headers,
-            timeout=10
-        )
-        data = resp.json()
-        
-        if data.get('code') != 0:
-            raise Exception(f"API错误: {data.get('message')}")
-        
-        items = data.get('data', {}).get('items', [])
         dynamics = []
-
-        for item in items:
-            modules = item.get('modules', {})
-            author = modules.get('module_author', {})
-            dynamic = modules.get('module_dynamic', {})
+        offset = ''
+        for _ in range(Config.BI_FEED_MAX_PAGES):
+            params = {
+                'host_mid': mid,
+                'platform': 'web',
+                'features': 'itemOpusStyle,listOnlyfans,opusBigCover,onlyfansVote,forwardListHidden,decorationCard,commentsNewVersion,onlyfansAssetsV2,ugcDelete,onlyfansQaCard,avatarAutoTheme,sunflowerStyle,cardsEnhance',
+                'web_location': '333.1387'
+            }
+            if offset:
+                params['offset'] = offset
+            signed_params = get_signed_params(params, cookie)
             
-            desc = dynamic.get('desc', {})
-            major = dynamic.get('major', {})
+            data = bili_get(
+                'feed',
+                'https://api.bilibili.com/x/polymer/web-dynamic/v1/feed/space',
+                params=signed_params,
+                headers=headers,
+                timeout=10
+            )
             
-            d = {
-                'id': item.get('id_str', ''),
-                'mid': mid,
-                'timestamp': author.get('pub_ts', 0),
-                'title': '',
-                'description': desc.get('text', '') if desc else '',
-                'cover': '',
-                'images': [],
-                'jumpUrl': f"https://t.bilibili.com/{item.get('id_str', '')}",
-                'commentOid': '',
-                'commentType': 17
-            }
+            if data.get('code') != 0:
+                raise Exception(f"API错误: {data.get('message')}")
             
-            if major:
-                major_type = major.get('type')
-                if major_type == 'MAJOR_TYPE_ARCHIVE':
-                    archive = major.get('archive', {})
-                    d['title'] = archive.get('title', '')
-                    d['cover'] = archive.get('cover', '')
-                    d['jumpUrl'] = archive.get('jump_url', d['jumpUrl'])
-                    d['commentOid'] = archive.get('aid', '')
-                    d['commentType'] = 1
-                elif major_type == 'MAJOR_TYPE_DRAW':
-                    draw = major.get('draw', {})
-                    d['images'] = [img.get('src', '') for img in draw.get('items', [])]
-                    d['commentOid'] = str(draw.get('id', ''))
-                    d['commentType'] = 11
-                elif major_type == 'MAJOR_TYPE_ARTICLE':
-                    article = major.get('article', {})
-                    d['title'] = article.get('title', '')
-                    d['cover'] = article.get('covers', [''])[0] if article.get('covers') else ''
-                    d['jumpUrl'] = article.get('jump_url', d['jumpUrl'])
-                    d['commentOid'] = str(article.get('id', ''))
-                    d['commentType'] = 12
-                elif major_type == 'MAJOR_TYPE_OPUS':
-                    opus = major.get('opus', {})
-                    d['title'] = opus.get('title', '')
-                    pics = opus.get('pics', [])
-                    d['cover'] = pics[0].get('url', '') if pics else ''
-                    d['jumpUrl'] = opus.get('jump_url', d['jumpUrl'])
-                    # opus.summary.text
-                    d['description'] = opus.get('summary', {}).get('text', '')
-                    d['commentType'] = 13
-
-            basic = item.get('basic', {})
-            if basic.get('comment_id_str'):
-                d['commentOid'] = basic.get('comment_id_str')
-            if basic.get('comment_type'):
-                d['commentType'] = basic.get('comment_type')
+            page = data.get('data', {})
+            reached = False
+            for item in page.get('items', []):
+                d = self._parse_dynamic(item, mid)
+                if mark and self._dynamic_key(d) <= mark:
+                    # 置顶动态不代表时间线位置，遇到普通动态才说明已到达高水位
+                    if item.get('modules', {}).get('module_tag', {}).get('text') != '置顶':
+                        reached = True
+                    continue
+                dynamics.append(d)
             
-            dynamics.append(d)
+            offset = page.get('offset') or ''
+            if mark is None or reached or not page.get('has_more') or not offset:
+                break
         
         return dynamics
     
-    def _fetch_comments(self, oid: str, type_: int, cookie: str) -> List[Dict]:
-        """从B站API获取评论（使用新的WBI签名接口）"""
+    def _parse_dynamic(self, item: Dict, mid: str) -> Dict:
+        """解析动态数据"""
+        modules = item.get('modules', {})
+        author = modules.get('module_author', {})
+        dynamic = modules.get('module_dynamic', {})
+        
+        desc = dynamic.get('desc', {})
+        major = dynamic.get('major', {})
+        
+        d = {
+            'id': item.get('id_str', ''),
+            'mid': mid,
+            'timestamp': author.get('pub_ts', 0),
+            'title': '',
+            'description': desc.get('text', '') if desc else '',
+            'cover': '',
+            'images': [],
+            'jumpUrl': f"https://t.bilibili.com/{item.get('id_str', '')}",
+            'commentOid': '',
+            'commentType': 17
+        }
+        
+        if major:
+            major_type = major.get('type')
+            if major_type == 'MAJOR_TYPE_ARCHIVE':
+                archive = major.get('archive', {})
+                d['title'] = archive.get('title', '')
+                d['cover'] = archive.get('cover', '')
+                d['jumpUrl'] = archive.get('jump_url', d['jumpUrl'])
+                d['commentOid'] = archive.get('aid', '')
+                d['commentType'] = 1
+            elif major_type == 'MAJOR_TYPE_DRAW':
+                draw = major.get('draw', {})
+                d['images'] = [img.get('src', '') for img in draw.get('items', [])]
+                d['commentOid'] = str(draw.get('id', ''))
+                d['commentType'] = 11
+            elif major_type == 'MAJOR_TYPE_ARTICLE':
+                article = major.get('article', {})
+                d['title'] = article.get('title', '')
+                d['cover'] = article.get('covers', [''])[0] if article.get('covers') else ''
+                d['jumpUrl'] = article.get('jump_url', d['jumpUrl'])
+                d['commentOid'] = str(article.get('id', ''))
+                d['commentType'] = 12
+            elif major_type == 'MAJOR_TYPE_OPUS':
+                opus = major.get('opus', {})
+                d['title'] = opus.get('title', '')
+                pics = opus.get('pics', [])
+                d['cover'] = pics[0].get('url', '') if pics else ''
+                d['jumpUrl'] = opus.get('jump_url', d['jumpUrl'])
+                # opus.summary.text
+                d['description'] = opus.get('summary', {}).get('text', '')
+                d['commentType'] = 13
+        
+        basic = item.get('basic', {})
+        if basic.get('comment_id_str'):
+            d['commentOid'] = basic.get('comment_id_str')
+        if basic.get('comment_type'):
+            d['commentType'] = basic.get('comment_type')
+        
+        return d
+    
+    @staticmethod
+    def _dynamic_key(dynamic: Dict) -> Tuple[int, int]:
+        """动态在时间线上的位置：(发布时间, 动态ID)"""
+        dynamic_id = str(dynamic.get('id') or '')
+        return int(dynamic.get('timestamp') or 0), int(dynamic_id) if dynamic_id.isdigit() else 0
+    
+    def _load_high_water(self) -> Dict[str, Tuple[int, int]]:
+        """获取各UP主的动态高水位（首次调用时从数据库加载）"""
+        if self._high_water is None:
+            try:
+                rows = db.execute_query("SELECT mid, pub_ts, dynamic_id FROM bi_up_cursors")
+                self._high_water = {
+                    row['mid']: (int(row['pub_ts']), int(row['dynamic_id'])) for row in rows
+                }
+            except Exception as e:
+                print(f"⚠️ 加载动态高水位失败（请执行 sql/bi_tables.sql 创建 bi_up_cursors 表）: {e}")
+                self._high_water = {}
+        return self._high_water
+    
+    def _advance_high_water(self, mid: str, dynamics: List[Dict]):
+        """动态保存成功后推进UP主的高水位并持久化"""
+        if not dynamics:
+            return
+        mark = max(self._dynamic_key(d) for d in dynamics)
+        if mark <= self._high_water.get(mid, (0, 0)):
+            return
+        self._high_water[mid] = mark
+        try:
+            db.execute_modify("""
+                INSERT INTO bi_up_cursors (mid, pub_ts, dynamic_id) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE pub_ts = VALUES(pub_ts), dynamic_id = VALUES(dynamic_id)
+            """, (mid, mark[0], str(mark[1])))
+        except Exception as e:
+            print(f"保存UP {mid} 动态高水位失败: {e}")
+    
+    def _fetch_comments(self, oid: str, type_: int, cookie: str, dynamic_id: Optional[str] = None) -> List[Dict]:
+        """从B站API获取评论（使用新的WBI签名接口）
+        
+        传入 dynamic_id 时记录评论线程游标：评论总数、最新根评论和置顶评论都未变化时返回空列表，
+        不解析也不抓取子回复；子回复只在回复数比上次增长时抓取新增的尾部页
+        """
         if not oid:
             return []
         
@@ -372,14 +614,14 @@ class PollingService:
         }
         
         # 使用新版评论接口（需要WBI签名）
-        resp = requests.get(
+        data = bili_get(
+            'reply',
             'https://api.bilibili.com/x/v2/reply/wbi/main',
             params=signed_params,
             headers=headers,
             timeout=10
         )
-        data = resp.json()
-
+        
         if data.get('code') != 0:
             return []
         
@@ -389,160 +631,290 @@ class PollingService:
         top_upper = top.get('upper') if top else None
         comments = []
         
+        reply_counts = None
+        if dynamic_id:
+            all_count = (data.get('data', {}).get('cursor') or {}).get('all_count')
+            cursor = (
+                int(all_count or 0),
+                max((int(r.get('rpid') or 0) for r in replies), default=0),
+                int(top_upper.get('rpid') or 0) if top_upper else 0
+            )
+            # 缺少评论总数时无法判断子回复是否变化，不跳过
+            if all_count is not None and self._comment_cursors.get(dynamic_id) == cursor:
+                return []
+            _, reply_counts = self._load_comment_state(dynamic_id)
+        
         # 处理置顶评论（UP主置顶）
         if top_upper:
-            pinned = self._parse_reply(top_upper, cookie, oid, type_, is_pinned=True)
-            comments.append(pinned)
+            comments.append(self._parse_reply(top_upper, is_pinned=True))
         
         # 处理普通评论
         for r in replies:
-            comment = self._parse_reply(r, cookie, oid, type_)
-            comments.append(comment)
+            comments.append(self._parse_reply(r))
+        
+        # 回复数比上次增长且内联回复不完整的线程抓取新增的尾部页（子回复按时间正序分页，
+        # 从包含最后一条已知回复的页开始），其余线程的内联回复已完整
+        plans: Dict[str, range] = {}
+        for c in comments:
+            known = reply_counts.get(c['id'], 0) if reply_counts is not None else 0
+            if c['replyCount'] > known and len(c['replies']) < c['replyCount']:
+                last_pn = math.ceil(c['replyCount'] / SUB_REPLY_PAGE_SIZE)
+                first_pn = max(1, (known - 1) // SUB_REPLY_PAGE_SIZE + 1, last_pn - SUB_REPLY_MAX_PAGES + 1)
+                plans[c['id']] = range(first_pn, last_pn + 1)
+            elif reply_counts is not None:
+                reply_counts[c['id']] = c['replyCount']
+        
+        complete = True
+        if plans:
+            fetched = self._fetch_sub_replies(oid, type_, cookie, plans)
+            for c in comments:
+                result = fetched.get(c['id'])
+                if isinstance(result, Exception):
+                    # 抓取失败时保留内联回复，回复数不更新
+                    print(f"获取子回复失败: {result}")
+                    complete = False
+                elif result is not None:
+                    c['replies'] = result
+                    if reply_counts is not None:
+                        reply_counts[c['id']] = c['replyCount']
+        
+        # 子回复全部抓取成功才记录游标，否则下一轮不会因游标未变而跳过，失败的线程得以重试；
+        # 保存评论失败时由 _poll_dynamic_comments 丢弃游标
+        if dynamic_id:
+            if complete:
+                self._comment_cursors[dynamic_id] = cursor
+            else:
+                self._comment_cursors.pop(dynamic_id, None)
         
         return comments
     
-    def _parse_reply(self, r: dict, cookie: str, oid: str, type_: int, is_pinned: bool = False) -> Dict:
-        """解析评论数据"""
+    @staticmethod
+    def _parse_sub_reply(sr: dict, root_id: str) -> Dict:
+        """解析子回复数据"""
+        return {
+            'id': str(sr.get('rpid', '')),
+            'content': sr.get('content', {}).get('message', ''),
+            'timestamp': sr.get('ctime', 0),
+            'userName': sr.get('member', {}).get('uname', ''),
+            'userFace': sr.get('member', {}).get('avatar', ''),
+            'rootId': root_id
+        }
+    
+    def _parse_reply(self, r: dict, is_pinned: bool = False) -> Dict:
+        """解析评论数据（replies 为内联回复，不完整时由 _fetch_comments 抓取子回复补全）"""
         root_id = str(r.get('rpid', ''))
-        reply_count = r.get('rcount', 0)
         
-        comment = {
+        return {
             'id': root_id,
             'content': r.get('content', {}).get('message', ''),
             'timestamp': r.get('ctime', 0),
             'userName': r.get('member', {}).get('uname', ''),
             'userFace': r.get('member', {}).get('avatar', ''),
             'isPinned': is_pinned,
-            'replyCount': reply_count,
+            'replyCount': r.get('rcount', 0),
             'rootId': root_id,
-            'replies': []
+            'replies': [self._parse_sub_reply(sr, root_id) for sr in r.get('replies', []) or []]
         }
-        
-        inline_replies = r.get('replies', []) or []
-        
-        if reply_count > 0 and len(inline_replies) < reply_count:
-            try:
-                sub_replies = self._fetch_sub_replies(oid, type_, root_id, cookie)
-                comment['replies'] = sub_replies
-            except Exception as e:
-                print(f"获取子回复失败: {e}")
-                for sr in inline_replies:
-                    comment['replies'].append({
-                        'id': str(sr.get('rpid', '')),
-                        'content': sr.get('content', {}).get('message', ''),
-                        'timestamp': sr.get('ctime', 0),
-                        'userName': sr.get('member', {}).get('uname', ''),
-                        'userFace': sr.get('member', {}).get('avatar', ''),
-                        'rootId': root_id
-                    })
-        else:
-            for sr in inline_replies:
-                comment['replies'].append({
-                    'id': str(sr.get('rpid', '')),
-                    'content': sr.get('content', {}).get('message', ''),
-                    'timestamp': sr.get('ctime', 0),
-                    'userName': sr.get('member', {}).get('uname', ''),
-                    'userFace': sr.get('member', {}).get('avatar', ''),
-                    'rootId': root_id
-                })
-        
-        return comment
-    
-    def _fetch_sub_replies(self, oid: str, type_: int, root: str, cookie: str, ps: int = 50) -> List[Dict]:
-        """获取子回复"""
+    
+    def _sub_reply_pool(self) -> ThreadPoolExecutor:
+        """子回复抓取线程池（所有轮询任务共享，限制同时进行的子回复请求数）"""
+        with self._cond:
+            if self._sub_reply_executor is None:
+                self._sub_reply_executor = ThreadPoolExecutor(
+                    max_workers=max(1, Config.BI_SUB_REPLY_CONCURRENCY), thread_name_prefix='poll-sub-reply'
+                )
+            return self._sub_reply_executor
+    
+    def _fetch_sub_reply_page(self, oid: str, type_: int, root: str, pn: int, cookie: str) -> Tuple[List[Dict], int]:
+        """获取一页子回复，返回 (回复列表, 子回复总数)（接口返回错误时抛出异常）"""
         headers = {
             'Cookie': cookie,
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Referer': 'https://www.bilibili.com'
         }
+        params = {
+            'oid': oid,
+            'type': type_,
+            'root': root,
+            'ps': SUB_REPLY_PAGE_SIZE,
+            'pn': pn,
+            'web_location': '333.1368'
+        }
         
-        all_replies = []
-        pn = 1
+        data = bili_get(
+            'sub_reply',
+            'https://api.bilibili.com/x/v2/reply/reply',
+            params=params,
+            headers=headers,
+            timeout=10
+        )
         
-        while True:
-            params = {
-                'oid': oid,
-                'type': type_,
-                'root': root,
-                'ps': ps,
-                'pn': pn,
-                'web_location': '333.1368'
-            }
-            
-            resp = requests.get(
-                'https://api.bilibili.com/x/v2/reply/reply',
-                params=params,
-                headers=headers,
-                timeout=10
-            )
-            data = resp.json()
-            
-            if data.get('code') != 0:
-                break
-            
-            replies = data.get('data', {}).get('replies', []) or []
-            if not replies:
-                break
-
-            for sr in replies:
-                all_replies.append({
-                    'id': str(sr.get('rpid', '')),
-                    'content': sr.get('content', {}).get('message', ''),
-                    'timestamp': sr.get('ctime', 0),
-                    'userName': sr.get('member', {}).get('uname', ''),
-                    'userFace': sr.get('member', {}).get('avatar', ''),
-                    'rootId': root
-                })
-            
-            if len(replies) < ps:
-                break
-            
-            pn += 1
-            if pn > 5:
-                break
+        if data.get('code') != 0:
+            raise Exception(f"API错误: {data.get('message')}")
+        
+        page = data.get('data', {})
+        replies = page.get('replies', []) or []
+        count = int((page.get('page') or {}).get('count') or 0)
+        return [self._parse_sub_reply(sr, root) for sr in replies], count
+    
+    def _fetch_sub_replies(self, oid: str, type_: int, cookie: str,
+                           plans: Dict[str, range]) -> Dict[str, Any]:
+        """并发获取多个评论线程指定页范围内的子回复
+        
+        先并发抓取各线程的第一页，按返回的子回复总数确定实际末页（不超过 SUB_REPLY_MAX_PAGES 页），
+        再并发抓取所有线程的其余页；返回 {根评论ID: 按页顺序的回复列表}，抓取失败的线程值为异常
+        """
+        pool = self._sub_reply_pool()
+        first_pages = {
+            root: pool.submit(self._fetch_sub_reply_page, oid, type_, root, pages.start, cookie)
+            for root, pages in plans.items()
+        }
+        
+        results: Dict[str, Any] = {}
+        rest_pages: Dict[str, list] = {}
+        for root, future in first_pages.items():
+            try:
+                replies, count = future.result()
+            except Exception as e:
+                results[root] = e
+                continue
+            results[root] = replies
+            if len(replies) < SUB_REPLY_PAGE_SIZE:
+                continue
+            first_pn = plans[root].start
+            last_pn = min(first_pn + SUB_REPLY_MAX_PAGES - 1,
+                          max(plans[root].stop - 1, math.ceil(count / SUB_REPLY_PAGE_SIZE)))
+            rest_pages[root] = [
+                pool.submit(self._fetch_sub_reply_page, oid, type_, root, pn, cookie)
+                for pn in range(first_pn + 1, last_pn + 1)
+            ]
+        
+        for root, futures in rest_pages.items():
+            for future in futures:
+                try:
+                    replies, _ = future.result()
+                except Exception as e:
+                    results[root] = e
+                    break
+                results[root].extend(replies)
         
-        return all_replies
+        return results
     
-    def _save_dynamic(self, dynamic: Dict, up: Dict) -> bool:
-        """保存动态，返回是否为新动态"""
-        sql = "SELECT 1 FROM bi_dynamics WHERE dynamic_id = %s"
-        exists = db.execute_query(sql, (dynamic['id'],), fetch_one=True)
+    def _save_dynamics(self, dynamics: List[Dict], up: Dict) -> List[Dict]:
+        """批量保存一页动态，返回新动态（按原顺序）
         
-        if exists:
-            return False
+        已存在的动态ID和已读ID各用一次 IN 查询获取，新动态用一条多行
+        INSERT ... ON DUPLICATE KEY 在单个事务中写入
+        """
+        unique: Dict[str, Dict] = {}
+        for d in dynamics:
+            if d.get('id'):
+                unique.setdefault(d['id'], d)
+        if not unique:
+            return []
+        
+        ids = list(unique)
+        placeholders = ', '.join(['%s'] * len(ids))
+        existing = {
+            row['dynamic_id'] for row in db.execute_query(
+                f"SELECT dynamic_id FROM bi_dynamics WHERE dynamic_id IN ({placeholders})", tuple(ids)
+            )
+        }
+        new_dynamics = [d for dynamic_id, d in unique.items() if dynamic_id not in existing]
+        if not new_dynamics:
+            return []
         
-        is_read = db.execute_query(
-            "SELECT 1 FROM bi_read_ids WHERE item_id = %s",
-            (dynamic['id'],), fetch_one=True
-        ) is not None
+        new_ids = [d['id'] for d in new_dynamics]
+        read_ids = read_id_cache.filter_read(new_ids)
         
+        # ON DUPLICATE KEY 保证与其他进程并发写入同一动态时不报错
         sql = """
             INSERT INTO bi_dynamics (dynamic_id, mid, timestamp, title, description, cover,
                 images, jump_url, comment_oid, comment_type, is_read)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE dynamic_id = dynamic_id
+        """
+        db.execute_many(sql, [
+            (
+                d['id'],
+                d['mid'],
+                int(d['timestamp']),
+                d.get('title', ''),
+                d.get('description', ''),
+                d.get('cover'),
+                json.dumps(d.get('images', [])),
+                d.get('jumpUrl', ''),
+                d.get('commentOid', ''),
+                int(d.get('commentType', 0)),
+                1 if d['id'] in read_ids else 0
+            )
+            for d in new_dynamics
+        ])
+        
+        return new_dynamics
+    
+    @staticmethod
+    def _comment_fingerprint(content: str, reply_count: int, is_pinned: bool) -> int:
+        """评论可变字段的指纹，相同则无需更新"""
+        return hash((content or '', int(reply_count or 0), 1 if is_pinned else 0))
+    
+    def _load_comment_state(self, dynamic_id: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """获取动态下已保存评论的指纹和根评论回复数（首次轮询该动态时从数据库加载）"""
+        fingerprints = self._comment_fingerprints.get(dynamic_id)
+        if fingerprints is None:
+            rows = db.execute_query(
+                "SELECT comment_id, parent_id, content, reply_count, is_pinned FROM bi_comments WHERE dynamic_id = %s",
+                (dynamic_id,)
+            )
+            fingerprints = {
+                row['comment_id']: self._comment_fingerprint(row['content'], row['reply_count'], row['is_pinned'])
+                for row in rows
+            }
+            self._comment_fingerprints[dynamic_id] = fingerprints
+            self._reply_counts[dynamic_id] = {
+                row['comment_id']: int(row['reply_count'] or 0) for row in rows if row['parent_id'] is None
+            }
+        return fingerprints, self._reply_counts.setdefault(dynamic_id, {})
+    
+    def _forget_comment_state(self, dynamic_id: str):
+        """丢弃动态的评论指纹、回复数和游标"""
+        self._comment_fingerprints.pop(dynamic_id, None)
+        self._reply_counts.pop(dynamic_id, None)
+        self._comment_cursors.pop(dynamic_id, None)
+    
+    def _save_comments(self, comments: List[Dict], dynamic_id: str) -> set:
+        """批量保存一个动态的评论及其回复，返回新插入的评论ID
+        
+        与指纹缓存比较，内容、回复数和置顶状态都未变化的评论不写数据库；
+        新增和变化的评论用一条多行 INSERT ... ON DUPLICATE KEY UPDATE 写入
         """
-        db.execute_modify(sql, (
-            dynamic['id'],
-            dynamic['mid'],
-            int(dynamic['timestamp']),
-            dynamic.get('title', ''),
-            dynamic.get('description', ''),
-            dynamic.get('cover'),
-            json.dumps(dynamic.get('images', [])),
-            dynamic.get('jumpUrl', ''),
-            dynamic.get('commentOid', ''),
-            int(dynamic.get('commentType', 0)),
-            1 if is_read else 0
-        ))
-        
-        return True
-    
-    def _save_comment(self, comment: Dict, dynamic_id: str, parent_id: str = None) -> bool:
-        """保存评论，返回是否为新评论"""
-        is_read = db.execute_query(
-            "SELECT 1 FROM bi_read_ids WHERE item_id = %s",
-            (comment['id'],), fetch_one=True
-        ) is not None
+        # comment_id -> (评论, parent_id)
+        rows: Dict[str, tuple] = {}
+        for c in comments:
+            rows.setdefault(c['id'], (c, None))
+            for reply in c.get('replies', []):
+                rows.setdefault(reply['id'], (reply, c['id']))
+        rows.pop('', None)
+        if not rows:
+            return set()
+        
+        fingerprints, _ = self._load_comment_state(dynamic_id)
+        new_ids = set()
+        changed: Dict[str, int] = {}
+        for comment_id, (comment, _) in rows.items():
+            fingerprint = self._comment_fingerprint(
+                comment.get('content', ''), comment.get('replyCount', 0), comment.get('isPinned')
+            )
+            old = fingerprints.get(comment_id)
+            if old is None:
+                new_ids.add(comment_id)
+            elif old == fingerprint:
+                continue
+            changed[comment_id] = fingerprint
+        if not changed:
+            return new_ids
+        
+        read_ids = read_id_cache.filter_read(new_ids) if new_ids else set()
         
         sql = """
             INSERT INTO bi_comments (comment_id, dynamic_id, parent_id, root_id, content,
@@ -553,25 +925,28 @@ class PollingService:
                 is_pinned = VALUES(is_pinned),
                 content = VALUES(content)
         """
-        affected_rows = db.execute_modify(sql, (
-            comment['id'],
-            dynamic_id,
-            parent_id,
-            comment.get('rootId'),
-            comment.get('content', ''),
-            int(comment.get('timestamp', 0)),
-            comment.get('userName', ''),
-            comment.get('userFace', ''),
-            1 if comment.get('isPinned') else 0,
-            int(comment.get('replyCount', 0)),
-            1 if is_read else 0
-        ))
-        
-        # affected_rows = 1 表示新插入，affected_rows = 2 表示更新了已存在的记录
-        return affected_rows == 1
+        params_list = []
+        for comment_id in changed:
+            comment, parent_id = rows[comment_id]
+            params_list.append((
+                comment_id,
+                dynamic_id,
+                parent_id,
+                comment.get('rootId'),
+                comment.get('content', ''),
+                int(comment.get('timestamp', 0)),
+                comment.get('userName', ''),
+                comment.get('userFace', ''),
+                1 if comment.get('isPinned') else 0,
+                int(comment.get('replyCount', 0)),
+                1 if comment_id in read_ids else 0
+            ))
+        db.execute_many(sql, params_list)
+        fingerprints.update(changed)
+        return new_ids
     
     def _send_dingtalk(self, type_: str, up_name: str, content: str, 
-                       jump_url: str, timestamp: int, settings: Dict):
+                       jump_url: str, timestamp: int, settings: Mapping[str, Any]):
         """发送钉钉通知"""
         access_token = settings.get('dingtalk_access_token')
         if not access_token:
@@ -596,7 +971,7 @@ class PollingService:
         url = f'https://oapi.dingtalk.com/robot/send?access_token={access_token}'
         
         try:
-            requests.post(url, json={'msgtype': 'markdown', 'markdown': markdown}, timeout=10)
+            dingtalk_session.post(url, json={'msgtype': 'markdown', 'markdown': markdown}, timeout=10)
         except Exception as e:
             print(f"发送钉钉通知失败: {e}")
     
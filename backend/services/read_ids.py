@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已读ID缓存模块
+在进程内维护 bi_read_ids 的成员关系，轮询路径上的已读判断变为内存查找
+"""
+
+import os
+import math
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Iterable, Set, Any
+
+from config import Config
+from services.database import db
+
+
+class BloomFilter:
+    """布隆过滤器：不在过滤器中的ID一定不存在"""
+    
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(1, capacity)
+        self.size = int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.hash_count = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+    
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+    
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class ReadIdCache:
+    """已读ID缓存类
+    
+    - 最近的已读ID保存在有界集合中（超出 BI_READ_ID_CACHE_SIZE 时淘汰最早的）
+    - 全部已读ID写入布隆过滤器；集合未淘汰过时不在集合中即为未读，
+      淘汰过之后只有布隆过滤器判断可能存在的ID才回表查询
+    - 按自增ID增量同步其他进程写入的已读记录
+    """
+    
+    _instance: Optional['ReadIdCache'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        self.max_entries = Config.BI_READ_ID_CACHE_SIZE
+        self._recent: Dict[str, None] = {}
+        self._bloom = BloomFilter(self.max_entries * 5)
+        # 集合是否包含全部已读ID（未发生淘汰）
+        self._complete = True
+        self._last_row_id = 0
+        self._last_sync = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            'memory_hits': 0,
+            'memory_negatives': 0,
+            'db_lookups': 0
+        }
+        self._init_done = True
+        # gunicorn preload 时子进程可能复制到被父进程线程持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def _add_locked(self, item_id: str):
+        """加入集合和布隆过滤器（调用方持有锁）"""
+        if item_id in self._recent:
+            return
+        self._recent[item_id] = None
+        self._bloom.add(item_id)
+        if len(self._recent) > self.max_entries:
+            del self._recent[next(iter(self._recent))]
+            self._complete = False
+    
+    def load(self) -> bool:
+        """从数据库加载已读ID（启动时调用）"""
+        if not db.is_available:
+            return False
+        try:
+            self._sync()
+            self._loaded = True
+            print(f"✓ 已加载 {len(self._recent)} 条已读记录"
+                  f"{'' if self._complete else '（超出缓存上限，部分回表查询）'}")
+            return True
+        except Exception as e:
+            print(f"加载已读记录失败: {e}")
+            return False
+    
+    def _sync(self):
+        """增量加载自增ID大于上次位置的已读记录"""
+        rows = db.execute_query(
+            "SELECT id, item_id FROM bi_read_ids WHERE id > %s ORDER BY id",
+            (self._last_row_id,)
+        )
+        with self._lock:
+            for row in rows:
+                self._add_locked(row['item_id'])
+                self._last_row_id = max(self._last_row_id, row['id'])
+            self._last_sync = time.time()
+    
+    def _maybe_sync(self):
+        """距上次同步超过 BI_READ_ID_SYNC_INTERVAL 秒时增量同步"""
+        if not self._loaded:
+            self.load()
+        elif time.time() - self._last_sync > Config.BI_READ_ID_SYNC_INTERVAL:
+            try:
+                self._sync()
+            except Exception as e:
+                print(f"同步已读记录失败: {e}")
+    
+    def _query(self, item_ids: list) -> Set[str]:
+        """回表查询已读ID"""
+        placeholders = ', '.join(['%s'] * len(item_ids))
+        rows = db.execute_query(
+            f"SELECT item_id FROM bi_read_ids WHERE item_id IN ({placeholders})", tuple(item_ids)
+        )
+        return {row['item_id'] for row in rows}
+    
+    def filter_read(self, item_ids: Iterable[str]) -> Set[str]:
+        """返回其中已读的ID，只有内存无法判断的ID才回表查询（一次IN查询）"""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return set()
+        self._maybe_sync()
+        if not self._loaded:
+            # 加载失败时直接查询数据库
+            return self._query(item_ids)
+        
+        read, unknown = set(), []
+        with self._lock:
+            for item_id in item_ids:
+                if item_id in self._recent:
+                    read.add(item_id)
+                    self._stats['memory_hits'] += 1
+                elif self._complete or item_id not in self._bloom:
+                    self._stats['memory_negatives'] += 1
+                else:
+                    unknown.append(item_id)
+            self._stats['db_lookups'] += len(unknown)
+        
+        if unknown:
+            found = self._query(unknown)
+            read |= found
+            with self._lock:
+                for item_id in found:
+                    self._add_locked(item_id)
+        return read
+    
+    def is_read(self, item_id: str, confirm: bool = False) -> bool:
+        """是否已读
+        
+        confirm=True 时只信任内存中的已读记录，未读结果回表确认
+        （其他进程刚写入的已读ID在下次增量同步前不在本进程内存中）
+        """
+        if not confirm:
+            return item_id in self.filter_read([item_id])
+        with self._lock:
+            if item_id in self._recent:
+                self._stats['memory_hits'] += 1
+                return True
+            self._stats['db_lookups'] += 1
+        if not self._query([item_id]):
+            return False
+        with self._lock:
+            self._add_locked(item_id)
+        return True
+    
+    def add(self, item_ids: Iterable[str]):
+        """记录新的已读ID（写入数据库后调用）"""
+        with self._lock:
+            for item_id in item_ids:
+                self._add_locked(item_id)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        with self._lock:
+            return {
+                'entries': len(self._recent),
+                'max_entries': self.max_entries,
+                'complete': self._complete,
+                'bloom_bytes': self._bloom.nbytes,
+                **self._stats
+            }
+
+
+# 全局已读ID缓存实例
+read_id_cache = ReadIdCache()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应缓存模块
+缓存热点查询已序列化（及预压缩）的响应字节，命中时跳过查询和JSON序列化
+"""
+
+import os
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Hashable
+
+from config import Config
+
+
+# 小于该大小的响应不压缩
+GZIP_MIN_SIZE = 1024
+
+
+class CachedResponse:
+    """已序列化的响应"""
+    
+    __slots__ = ('body', 'gzip_body')
+    
+    def __init__(self, body: bytes):
+        self.body = body
+        self.gzip_body: Optional[bytes] = None
+        if len(body) >= GZIP_MIN_SIZE:
+            compressed = gzip.compress(body, compresslevel=6)
+            if len(compressed) < len(body):
+                self.gzip_body = compressed
+    
+    @property
+    def size(self) -> int:
+        return len(self.body) + (len(self.gzip_body) if self.gzip_body else 0)
+
+
+class ResponseCache:
+    """LRU响应缓存"""
+    
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+        # gunicorn preload 时子进程可能复制到被父进程线程持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """获取缓存的响应，命中时移动到LRU队尾"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+    
+    def put(self, key: Hashable, body: bytes) -> CachedResponse:
+        """写入响应字节（在锁外完成压缩），超出容量时淘汰最久未使用的条目"""
+        entry = CachedResponse(body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return entry
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': sum(e.size for e in self._entries.values()),
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None
+            }
+
+
+# 基金列表热点查询响应缓存
+fund_list_response_cache = ResponseCache('fund_list', Config.FUND_LIST_CACHE_SIZE)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设置缓存模块
+在进程内缓存 bi_settings 的只读快照，轮询和接口读取设置不再查询数据库
+"""
+
+import os
+import time
+import threading
+from types import MappingProxyType
+from typing import Optional, Callable, List, Mapping, Dict, Any
+
+from config import Config
+from services.database import db
+
+
+# 设置变化监听器：listener(旧快照, 新快照)
+SettingsListener = Callable[[Mapping[str, Any], Mapping[str, Any]], None]
+
+
+class SettingsCache:
+    """设置缓存类
+    
+    - 快照为只读映射（MappingProxyType），可在线程间共享，调用方无法修改
+    - 本进程保存设置后调用 invalidate() 立即重新加载
+    - 其他进程保存的设置在 BI_SETTINGS_TTL 秒内被重新加载
+    - 重新加载后内容变化时通知监听器（在锁外调用）
+    """
+    
+    _instance: Optional['SettingsCache'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        self._snapshot: Optional[Mapping[str, Any]] = None
+        self._loaded_at = 0.0
+        self._listeners: List[SettingsListener] = []
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            'hits': 0,
+            'reloads': 0,
+            'changes': 0
+        }
+        self._init_done = True
+        # gunicorn preload 时子进程可能复制到被父进程线程持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def subscribe(self, listener: SettingsListener):
+        """注册设置变化监听器"""
+        self._listeners.append(listener)
+    
+    def get(self) -> Mapping[str, Any]:
+        """获取设置快照（没有设置行时为空映射）"""
+        with self._lock:
+            if self._snapshot is not None and time.time() - self._loaded_at < Config.BI_SETTINGS_TTL:
+                self._stats['hits'] += 1
+                return self._snapshot
+        return self._reload()
+    
+    def invalidate(self) -> Mapping[str, Any]:
+        """设置已修改：立即重新加载并返回新快照"""
+        return self._reload()
+    
+    def _reload(self) -> Mapping[str, Any]:
+        """从数据库重新加载，加载失败时沿用旧快照"""
+        try:
+            row = db.execute_query("SELECT * FROM bi_settings WHERE id = 1", fetch_one=True)
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            print(f"加载设置失败，沿用缓存: {e}")
+            return self._snapshot
+        
+        snapshot = MappingProxyType(dict(row) if row else {})
+        with self._lock:
+            old = self._snapshot
+            self._snapshot = snapshot
+            self._loaded_at = time.time()
+            self._stats['reloads'] += 1
+            changed = old is not None and dict(old) != dict(snapshot)
+            if changed:
+                self._stats['changes'] += 1
+        
+        if changed:
+            for listener in list(self._listeners):
+                try:
+                    listener(old, snapshot)
+                except Exception as e:
+                    print(f"设置变化通知失败: {e}")
+        return snapshot
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        with self._lock:
+            return {
+                'loaded': self._snapshot is not None,
+                'age': round(time.time() - self._loaded_at, 1) if self._snapshot is not None else None,
+                'ttl': Config.BI_SETTINGS_TTL,
+                **self._stats
+            }
+
+
+# 全局设置缓存实例
+settings_cache = SettingsCache()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A股交易日历模块
+判断交易日及最近一次净值发布时间，交易日历不可用时按工作日兜底
+"""
+
+import os
+import json
+import time
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date, timedelta
+from typing import Optional, List
+
+import akshare as ak
+import pandas as pd
+
+from config import Config
+from services.circuit_breaker import akshare_breaker
+
+
+# 交易日历持久化文件
+CALENDAR_FILE = 'trade_dates.json'
+
+# 日历不覆盖查询日期时重新读取持久化文件的最短间隔（秒），其他进程更新的日历据此生效
+DISK_RECHECK_INTERVAL = 60
+
+
+class TradingCalendar:
+    """A股交易日历类
+    
+    日历只从本地文件加载，需要更新时在后台线程中从AKShare获取，
+    请求线程从不等待上游；更新完成前按工作日判断
+    """
+    
+    _instance: Optional['TradingCalendar'] = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if hasattr(self, '_init_done') and self._init_done:
+            return
+        
+        # 升序的交易日（date.toordinal()），为空时按工作日判断
+        self._days: List[int] = []
+        self._lock = threading.Lock()
+        self._path = os.path.join(Config.DATA_DIR, CALENDAR_FILE)
+        self._last_attempt: Optional[date] = None
+        self._disk_checked = 0.0
+        self._init_done = True
+        # gunicorn preload 时子进程可能复制到被后台更新线程持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def _load_from_disk(self) -> List[int]:
+        """加载持久化的交易日历"""
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                return sorted(date.fromisoformat(d).toordinal() for d in json.load(f))
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"加载交易日历失败: {e}")
+            return []
+    
+    def _fetch(self) -> List[int]:
+        """从AKShare获取交易日历并持久化"""
+        df = akshare_breaker.call(ak.tool_trade_date_hist_sina)
+        days = sorted({d.toordinal() for d in pd.to_datetime(df['trade_date']).dt.date})
+        try:
+            os.makedirs(Config.DATA_DIR, exist_ok=True)
+            tmp_path = f"{self._path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([date.fromordinal(d).isoformat() for d in days], f)
+            os.replace(tmp_path, self._path)
+        except Exception as e:
+            print(f"保存交易日历失败: {e}")
+        print(f"✓ 交易日历已更新，共 {len(days)} 个交易日")
+        return days
+    
+    def _ensure_loaded(self, day: date):
+        """确保日历覆盖指定日期：不覆盖时重新读取本地文件，仍不覆盖则在后台更新（每天最多一次），不阻塞调用方"""
+        with self._lock:
+            if self._days and self._days[-1] >= day.toordinal():
+                return
+            now = time.monotonic()
+            if now - self._disk_checked >= DISK_RECHECK_INTERVAL:
+                self._disk_checked = now
+                days = self._load_from_disk()
+                if len(days) > len(self._days):
+                    self._days = days
+                if self._days and self._days[-1] >= day.toordinal():
+                    return
+            today = date.today()
+            if self._last_attempt == today:
+                return
+            self._last_attempt = today
+        
+        threading.Thread(target=self._refresh, name='trading-calendar', daemon=True).start()
+    
+    def _refresh(self):
+        """后台更新交易日历"""
+        try:
+            days = self._fetch()
+        except Exception as e:
+            print(f"获取交易日历失败，按工作日判断: {e}")
+            return
+        with self._lock:
+            self._days = days
+    
+    def is_trading_day(self, day: date) -> bool:
+        """是否为交易日"""
+        self._ensure_loaded(day)
+        with self._lock:
+            days = self._days
+        if not days or day.toordinal() > days[-1]:
+            return day.weekday() < 5
+        pos = bisect_left(days, day.toordinal())
+        return pos < len(days) and days[pos] == day.toordinal()
+    
+    def previous_trading_day(self, day: date) -> date:
+        """不晚于指定日期的最近一个交易日"""
+        self._ensure_loaded(day)
+        with self._lock:
+            days = self._days
+        if days and days[0] <= day.toordinal() <= days[-1]:
+            return date.fromordinal(days[bisect_right(days, day.toordinal()) - 1])
+        while day.weekday() >= 5:
+            day -= timedelta(days=1)
+        return day
+    
+    def next_trading_day(self, day: date) -> date:
+        """不早于指定日期的最近一个交易日"""
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+    
+    @staticmethod
+    def _publish_time(day: date) -> datetime:
+        """指定交易日的净值发布完成时间"""
+        hour, minute = map(int, Config.FUND_NAV_PUBLISH_TIME.split(':'))
+        return datetime(day.year, day.month, day.day, hour, minute)
+    
+    def last_publication_time(self, now: datetime = None) -> datetime:
+        """最近一次净值发布时间（非交易日不发布新净值）"""
+        now = now or datetime.now()
+        day = self.previous_trading_day(now.date())
+        if self._publish_time(day) > now:
+            day = self.previous_trading_day(day - timedelta(days=1))
+        return self._publish_time(day)
+    
+    def next_publication_time(self, now: datetime = None) -> datetime:
+        """下一次净值发布时间"""
+        now = now or datetime.now()
+        day = self.next_trading_day(now.date())
+        if self._publish_time(day) <= now:
+            day = self.next_trading_day(day + timedelta(days=1))
+        return self._publish_time(day)
+
+
+# 全局交易日历实例
+trading_calendar = TradingCalendar()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游调用执行器模块
+在独立的有界线程池中执行上游抓取，请求线程只在截止时间内等待，
+避免上游变慢时占满gunicorn请求worker
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from config import Config
+
+
+class UpstreamPendingError(Exception):
+    """超过截止时间仍未完成，任务继续在后台执行，客户端可稍后轮询"""
+    pass
+
+
+class UpstreamBusyError(Exception):
+    """等待执行的上游任务过多，拒绝新任务"""
+    pass
+
+
+class UpstreamExecutor:
+    """有界上游执行器
+
+    - 相同key的任务合并为一个（in-flight去重），多个请求共享同一个Future
+    - 排队+执行中的任务数超过上限时直接拒绝
+    - 已完成任务的结果保留一段时间，供轮询的客户端直接取回
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, result_ttl: float):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._done: Dict[str, Tuple[Future, float]] = {}
+        self._stats: Dict[str, int] = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'rejected': 0,
+            'deadline_exceeded': 0
+        }
+        # gunicorn preload 时子进程复制的线程池没有工作线程，进行中的任务也不会在子进程中完成
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='upstream')
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._done = {}
+
+    def _on_done(self, key: str, future: Future):
+        """任务完成：从in-flight移入结果缓存"""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._done[key] = (future, time.time())
+
+    def _purge_done(self):
+        """清理过期的结果（调用方持有锁）"""
+        now = time.time()
+        expired = [k for k, (_, t) in self._done.items() if now - t > self.result_ttl]
+        for k in expired:
+            del self._done[k]
+
+    def submit(self, key: str, func: Callable, *args, **kwargs) -> Future:
+        """提交任务，相同key的任务在执行中或结果未过期时复用
+
+        Raises:
+            UpstreamBusyError: 等待中的任务超过上限
+        """
+        with self._lock:
+            self._purge_done()
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['deduplicated'] += 1
+                return future
+
+            done = self._done.pop(key, None)
+            if done is not None:
+                # 结果只交付一次，之后的请求重新走缓存/抓取
+                return done[0]
+
+            if len(self._inflight) >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise UpstreamBusyError(f'上游任务排队已满（{self.max_pending}）')
+
+            future = self._executor.submit(func, *args, **kwargs)
+            self._inflight[key] = future
+            self._stats['submitted'] += 1
+
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return future
+
+    def run(self, key: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """提交任务并在截止时间内等待结果
+
+        超时后等待方放弃等待并抛出 UpstreamPendingError，任务本身继续执行，
+        完成后的结果在 result_ttl 内可通过相同key取回
+
+        Raises:
+            UpstreamPendingError: 超过截止时间
+            UpstreamBusyError: 等待中的任务超过上限
+        """
+        if timeout is None:
+            timeout = Config.UPSTREAM_DEADLINE
+
+        future = self.submit(key, func, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats['deadline_exceeded'] += 1
+            raise UpstreamPendingError(f'上游任务 {key} 未在 {timeout} 秒内完成')
+
+    def discard(self, key: str):
+        """丢弃已完成但未取回的结果，下一次提交重新执行"""
+        with self._lock:
+            self._done.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照（用于健康检查）"""
+        with self._lock:
+            self._purge_done()
+            return {
+                'inflight': len(self._inflight),
+                'max_pending': self.max_pending,
+                'completed_waiting': len(self._done),
+                **self._stats
+            }
+
+
+# 全局上游执行器实例
+upstream_executor = UpstreamExecutor(
+    max_workers=Config.UPSTREAM_WORKERS,
+    max_pending=Config.UPSTREAM_MAX_PENDING,
+    result_ttl=Config.UPSTREAM_RESULT_TTL
+)
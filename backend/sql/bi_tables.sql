@@ -91,6 +91,22 @@ CREATE TABLE IF NOT EXISTS `bi_read_ids` (
     INDEX `idx_item_id` (`item_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='已读记录表';
 
+-- UP主动态高水位表（轮询时跳过已见过的动态）
+CREATE TABLE IF NOT EXISTS `bi_up_cursors` (
+    `mid` VARCHAR(50) PRIMARY KEY COMMENT 'UP主ID',
+    `pub_ts` BIGINT NOT NULL COMMENT '已见最新动态的发布时间戳',
+    `dynamic_id` VARCHAR(50) NOT NULL COMMENT '已见最新动态ID',
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='UP主动态高水位表';
+
+-- 轮询主节点租约表（多进程/多主机部署时只有持有未过期租约的进程执行轮询）
+CREATE TABLE IF NOT EXISTS `bi_leader_lease` (
+    `name` VARCHAR(50) PRIMARY KEY COMMENT '租约名称',
+    `holder` VARCHAR(255) NOT NULL COMMENT '持有者(主机名:进程ID:随机后缀)',
+    `expires_at` DATETIME(3) NOT NULL COMMENT '租约到期时间(数据库时间)',
+    `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='轮询主节点租约表';
+
 -- 轮询日志表（可选，用于调试和监控）
 CREATE TABLE IF NOT EXISTS `bi_polling_logs` (
     `id` INT PRIMARY KEY AUTO_INCREMENT,
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件锁模块
+多个进程（如 gunicorn 的各个 worker）对 DATA_DIR 下同一个文件做读-改-写时互斥
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 上只用于单进程开发调试，不加锁
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """持有 path 的进程间排他锁（锁文件为 path.lock，与数据文件分开，数据文件可被原子替换）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP客户端模块
+B站和钉钉请求共用的长连接会话，复用TCP/TLS连接，按主机限制连接数并自动重试
+"""
+
+import os
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+
+# 请求处理线程（如搜索UP主）在轮询并发之外额外占用的连接数
+EXTRA_CONNECTIONS = 4
+
+
+def _mount_adapter(session: requests.Session, pool_size: int, retries: int, backoff_factor: float):
+    """为会话挂载新的连接池（替换原有连接池，不复用其中的连接）"""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def _build_session(pool_size: int, retries: int, backoff_factor: float) -> requests.Session:
+    """创建带连接池和重试的会话
+    
+    - 每个主机最多 pool_size 个连接，已满时等待空闲连接而不是新建
+    - 连接失败总是重试；读超时和5xx/429只对GET重试，避免钉钉消息重复发送
+    - 不保存响应中的Cookie，各请求显式携带自己的Cookie头
+    """
+    session = requests.Session()
+    _mount_adapter(session, pool_size, retries, backoff_factor)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+# B站接口会话（api.bilibili.com），连接数覆盖轮询任务和共享的子回复线程池同时发出的请求
+BILI_POOL_OPTIONS = {
+    'pool_size': Config.BI_POLL_CONCURRENCY + Config.BI_SUB_REPLY_CONCURRENCY + EXTRA_CONNECTIONS,
+    'retries': 2,
+    'backoff_factor': 0.5
+}
+bili_session = _build_session(**BILI_POOL_OPTIONS)
+
+# 钉钉机器人会话（oapi.dingtalk.com）
+DINGTALK_POOL_OPTIONS = {'pool_size': 2, 'retries': 2, 'backoff_factor': 1}
+dingtalk_session = _build_session(**DINGTALK_POOL_OPTIONS)
+
+
+def _reset_after_fork():
+    """子进程换用新的连接池：gunicorn preload 时子进程复制了父进程已建立的长连接，
+    继续使用会与父进程在同一个TLS连接上交错读写（会话对象被其他模块直接引用，只替换连接池）"""
+    _mount_adapter(bili_session, **BILI_POOL_OPTIONS)
+    _mount_adapter(dingtalk_session, **DINGTALK_POOL_OPTIONS)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B站接口限流模块
+按接口类别的令牌桶限流，遇到风控（-412/-352）时带抖动退避冷却并降低速率，恢复后逐步回升
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Tuple
+
+from config import Config
+from utils.http import bili_session
+
+
+# 风控错误码（HTTP 412 也按 -412 处理）
+RISK_CONTROL_CODES = frozenset([-412, -352])
+
+# 各接口类别的速率（每秒令牌数）和桶容量（允许的突发请求数）
+BILI_ENDPOINT_LIMITS = {
+    'feed': (1.0, 4),        # 空间动态 /x/polymer/web-dynamic/v1/feed/space
+    'reply': (2.0, 5),       # 评论首页 /x/v2/reply/wbi/main
+    'sub_reply': (4.0, 8),   # 子回复 /x/v2/reply/reply
+    'nav': (0.2, 2),         # WBI密钥 /x/web-interface/nav
+    'search': (1.0, 3),      # 搜索UP主 /x/web-interface/wbi/search/type
+}
+
+# 风控退避：首次冷却 BASE_BACKOFF 秒，连续风控时翻倍，最长 MAX_BACKOFF 秒
+BASE_BACKOFF = 30.0
+MAX_BACKOFF = 900.0
+# 风控后速率减半，但不低于额定速率的 MIN_RATE_FACTOR；每次成功回升额定速率的 RATE_RECOVERY_STEP
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+# 统计已发出请求数的滑动窗口（秒），轮询调度按此窗口内的实际请求数控制预算
+REQUEST_WINDOW = 60.0
+
+
+class RateLimitedError(Exception):
+    """需要等待的时间超过上限（冷却中或令牌不足），请求未发出"""
+    pass
+
+
+class TokenBucket:
+    """令牌桶（调用方负责加锁）"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+    
+    def reserve(self, now: float) -> float:
+        """预留一个令牌，返回需要等待的秒数（令牌可透支，等待期间归属本次请求）"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def refund(self):
+        """归还未使用的令牌"""
+        self._tokens += 1
+
+
+class EndpointLimiter:
+    """单个接口类别的限流器
+    
+    - normal: 按额定速率放行
+    - cooldown: 遇到风控后冷却（BASE_BACKOFF 起指数退避并加抖动），期间请求等待或被拒绝
+    - recovering: 冷却结束后以降低的速率放行，每次成功逐步回升到额定速率
+    """
+    
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.nominal_rate = rate
+        self._bucket = TokenBucket(rate, capacity)
+        self._lock = threading.Lock()
+        self._strikes = 0
+        self._cooldown_until = 0.0
+        self._stats: Dict[str, Any] = {
+            'requests': 0,
+            'throttled': 0,
+            'wait_seconds': 0.0,
+            'rejected': 0,
+            'risk_control': 0,
+            'errors': 0,
+            'last_risk_control': None
+        }
+        # gunicorn preload 时子进程可能复制到被父进程轮询线程持有的锁
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+    
+    def acquire(self, max_wait: float):
+        """等待令牌（需要等待超过 max_wait 秒时抛出 RateLimitedError）"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._cooldown_until - now, self._bucket.reserve(now))
+            if wait > max_wait:
+                self._bucket.refund()
+                self._stats['rejected'] += 1
+                raise RateLimitedError(f'B站接口 {self.name} 限流中，约 {wait:.0f} 秒后可用')
+            if wait > 0:
+                self._stats['throttled'] += 1
+                self._stats['wait_seconds'] += wait
+        if wait > 0:
+            time.sleep(wait)
+    
+    def record(self, code: Optional[int]):
+        """记录一次请求结果（code 为B站返回码，请求失败时为 None）"""
+        with self._lock:
+            self._stats['requests'] += 1
+            if code in RISK_CONTROL_CODES:
+                self._strikes += 1
+                backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (self._strikes - 1))
+                # 抖动避免多个接口类别或多个进程同时恢复
+                backoff *= random.uniform(0.5, 1.0)
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + backoff)
+                self._bucket.rate = max(self.nominal_rate * MIN_RATE_FACTOR, self._bucket.rate / 2)
+                self._stats['risk_control'] += 1
+                self._stats['last_risk_control'] = time.time()
+                print(f"⚠️ B站接口 {self.name} 触发风控({code})，冷却 {backoff:.0f} 秒，"
+                      f"速率降至 {self._bucket.rate:.2f}/秒")
+                return
+            
+            if code != 0:
+                self._stats['errors'] += 1
+                return
+            if self._bucket.rate < self.nominal_rate:
+                self._bucket.rate = min(self.nominal_rate,
+                                        self._bucket.rate + self.nominal_rate * RATE_RECOVERY_STEP)
+            else:
+                self._strikes = 0
+    
+    @property
+    def state(self) -> str:
+        if time.monotonic() < self._cooldown_until:
+            return 'cooldown'
+        if self._bucket.rate < self.nominal_rate:
+            return 'recovering'
+        return 'normal'
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """状态快照"""
+        with self._lock:
+            result = {
+                'state': self.state,
+                'rate': round(self._bucket.rate, 3),
+                'nominal_rate': self.nominal_rate,
+                'strikes': self._strikes,
+                **self._stats
+            }
+            result['wait_seconds'] = round(result['wait_seconds'], 1)
+            if result['state'] == 'cooldown':
+                result['cooldown_remaining'] = round(self._cooldown_until - time.monotonic(), 1)
+            return result
+
+
+class RateLimiter:
+    """按接口类别分别限流，并统计最近 REQUEST_WINDOW 秒内本进程实际发出的请求"""
+    
+    def __init__(self, limits: Dict[str, tuple], scale: float = 1.0):
+        self._endpoints = {
+            name: EndpointLimiter(name, rate * scale, capacity)
+            for name, (rate, capacity) in limits.items()
+        }
+        self._sent: deque = deque()
+        self._sent_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self):
+        self._sent = deque()
+        self._sent_lock = threading.Lock()
+    
+    def endpoint(self, name: str) -> EndpointLimiter:
+        return self._endpoints[name]
+    
+    def _prune(self, now: float):
+        while self._sent and now - self._sent[0] >= REQUEST_WINDOW:
+            self._sent.popleft()
+    
+    def note_sent(self):
+        """记录一次已发出的请求（所有接口类别）"""
+        now = time.time()
+        with self._sent_lock:
+            self._prune(now)
+            self._sent.append(now)
+    
+    def recent_sent(self) -> Tuple[int, Optional[float]]:
+        """最近 REQUEST_WINDOW 秒内发出的请求数和其中最早一次的时间"""
+        now = time.time()
+        with self._sent_lock:
+            self._prune(now)
+            return len(self._sent), (self._sent[0] if self._sent else None)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: limiter.snapshot() for name, limiter in self._endpoints.items()}
+
+
+# B站接口限流器
+bili_limiter = RateLimiter(BILI_ENDPOINT_LIMITS, scale=Config.BI_RATE_SCALE)
+
+
+def bili_get(endpoint: str, url: str, max_wait: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    """经限流器请求B站接口，返回解析后的JSON（HTTP 412 按返回码 -412 处理）
+    
+    Raises:
+        RateLimitedError: 需要等待的时间超过 max_wait（默认 BI_RATE_MAX_WAIT 秒）
+    """
+    limiter = bili_limiter.endpoint(endpoint)
+    limiter.acquire(Config.BI_RATE_MAX_WAIT if max_wait is None else max_wait)
+    bili_limiter.note_sent()
+    try:
+        resp = bili_session.get(url, **kwargs)
+        if resp.status_code == 412:
+            data = {'code': -412, 'message': '请求被风控拦截(HTTP 412)'}
+        else:
+            data = resp.json()
+    except Exception:
+        limiter.record(None)
+        raise
+    limiter.record(data.get('code'))
+    return data
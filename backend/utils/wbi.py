@@ -7,9 +7,10 @@ WBI签名工具模块
 
 import time
 import hashlib
-import requests
 from urllib.parse import urlencode
 
+from utils.rate_limit import bili_get
+
 
 # WBI混淆密钥表
 MIXIN_KEY_ENC_TAB = [
@@ -60,12 +61,12 @@ def refresh_wbi_keys(cookie: str) -> bool:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Referer': 'https://www.bilibili.com'
         }
-        resp = requests.get(
+        data = bili_get(
+            'nav',
             'https://api.bilibili.com/x/web-interface/nav',
             headers=headers,
             timeout=10
         )
-        data = resp.json()
         
         if data.get('code') != 0:
             print(f"刷新WBI密钥失败: {data.get('message')}")
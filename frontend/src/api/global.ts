@@ -20,16 +20,24 @@ import request, { Res } from '@/utils/request'
 export interface FundItem {
   code: string
   name: string
+  type?: string
   net_value: number
   daily_growth: number
   total_value: number
 }
 
+export interface FundFacets {
+  types: Record<string, number>
+  categories: Record<string, number>
+}
+
 export interface FundListRes {
   cache_time: string
   funds: FundItem[]
   returned_count: number
   total_count: number
+  matched_count?: number
+  facets?: FundFacets
 }
 
 export const getFundList = (query: string) => {
@@ -48,10 +56,21 @@ export interface FundDataRes {
   fund_code: string
   list: FundDataItem[]
   start_date: string
+  stale?: boolean
+  data_time?: string
 }
 
-export const getFundData = ({ fundCode, startDate, endDate }: { fundCode: string; startDate?: string; endDate?: string }) => {
-  return request.get<Res<FundDataRes>, Res<FundDataRes>>(
-    `/api/fund_data?code=${fundCode}&start_date=${startDate || ''}&end_date=${endDate || ''}`
-  )
+// 上游数据仍在后台获取时，接口返回 202 + pending，按 retry_after 轮询
+type PendingRes<T> = Res<T> & { pending?: boolean; retry_after?: number }
+
+const MAX_PENDING_POLLS = 10
+
+export const getFundData = async ({ fundCode, startDate, endDate }: { fundCode: string; startDate?: string; endDate?: string }) => {
+  const url = `/api/fund_data?code=${fundCode}&start_date=${startDate || ''}&end_date=${endDate || ''}`
+  let res = await request.get<PendingRes<FundDataRes>, PendingRes<FundDataRes>>(url)
+  for (let i = 0; res.pending && i < MAX_PENDING_POLLS; i++) {
+    await new Promise((resolve) => setTimeout(resolve, (res.retry_after || 2) * 1000))
+    res = await request.get<PendingRes<FundDataRes>, PendingRes<FundDataRes>>(url)
+  }
+  return res as Res<FundDataRes>
 }